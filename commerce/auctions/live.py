@@ -0,0 +1,57 @@
+# In-process publish/subscribe hub for live bid updates.
+#
+# Under ASGI each open listing page holds one Server-Sent Events stream (views.serve_bid_stream), which is an asyncio
+# task waiting on its own queue, so an idle subscriber costs a queue and a socket rather than a thread.  Under WSGI
+# nothing subscribes: views.bid_stream answers with the current state and the page polls.  views.record_bid publishes
+# the listing's new price and bid count once its transaction commits.  Publishing may happen on any thread; the
+# event is handed to each subscriber's event loop with call_soon_threadsafe.
+#
+# The hub only reaches subscribers in the same process.  Running several ASGI worker processes would need a shared
+# broker in its place.
+
+import threading
+
+QUEUE_SIZE = 8
+
+
+def offer(queue, event):
+    # Runs on the subscriber's event loop.  A subscriber that has fallen behind only needs the latest state,
+    # so the oldest event makes room for the new one.
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class BidHub:
+    def __init__(self):
+        self.subscribers = {}  # listing id -> set of (event loop, queue)
+        self.lock = threading.Lock()
+
+    def subscribe(self, listing_id, loop, queue):
+        with self.lock:
+            self.subscribers.setdefault(listing_id, set()).add((loop, queue))
+
+    def unsubscribe(self, listing_id, loop, queue):
+        with self.lock:
+            subscribers = self.subscribers.get(listing_id)
+            if subscribers:
+                subscribers.discard((loop, queue))
+                if not subscribers:
+                    del self.subscribers[listing_id]
+
+    def has_subscribers(self, listing_id):
+        return listing_id in self.subscribers
+
+    def publish(self, listing_id, event):
+        with self.lock:
+            subscribers = list(self.subscribers.get(listing_id, ()))
+        for loop, queue in subscribers:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(offer, queue, event)
+
+    def count(self):
+        with self.lock:
+            return sum(len(subscribers) for subscribers in self.subscribers.values())
+
+
+hub = BidHub()
@@ -0,0 +1,57 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from auctions.models import Bid, Comment, Listing, User
+
+
+class Command(BaseCommand):
+    help = "Times the listing page on a throwaway listing with a long bid and comment history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bids", type=int, default=10000, help="Number of bids on the listing.")
+        parser.add_argument("--comments", type=int, default=10000, help="Number of comments on the listing.")
+        parser.add_argument("--users", type=int, default=50, help="Number of different bidders and commenters.")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timed requests.")
+
+    def handle(self, *args, **options):
+        # Throwaway users with names no real account has, so the cleanup below only ever deletes what was made here.
+        users = User.objects.bulk_create(User(username=f"benchmark-{uuid.uuid4().hex}") for _ in range(options["users"]))
+        listing = Listing.objects.create(title="Benchmark", description="Benchmark listing", User=users[0], status="Closed")
+        client = Client()
+        try:
+            Bid.objects.bulk_create(
+                Bid(price=i + 1, User=users[i % len(users)], Listing=listing) for i in range(options["bids"])
+            )
+            Comment.objects.bulk_create(
+                Comment(comment=f"Comment {i}", User=users[i % len(users)], Listing=listing) for i in range(options["comments"])
+            )
+            Listing.objects.filter(id=listing.id).recompute_bid_totals()
+
+            # Signed in, so the watchlist check and the owner check run too.
+            client.force_login(users[1])
+            url = f"/listing/{listing.id}"
+            host = next((host for host in settings.ALLOWED_HOSTS if host != "*" and not host.startswith(".")), "localhost")
+            timings = []
+            for _ in range(options["repeat"]):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(url, HTTP_HOST=host)
+                    timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f"{url} answered {response.status_code}.")
+        finally:
+            client.logout()
+            listing.delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+        # The query budget itself is checked by auctions.tests.ListingPageQueriesTests.
+        self.stdout.write(
+            f"Listing with {options['bids']} bids and {options['comments']} comments: "
+            f"{len(queries)} queries, best {min(timings) * 1000:.1f} ms, {len(response.content) // 1024} KB of HTML."
+        )
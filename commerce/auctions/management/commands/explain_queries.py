@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auctions.queryplans import hot_queries, seed
+
+
+class Command(BaseCommand):
+    help = "Seeds throwaway data and prints the plans for the auctions app's hot queries on it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=2000, help="Number of listings to seed.")
+        parser.add_argument("--bids", type=int, default=20, help="Bids and comments per listing.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, listing = seed(options["listings"], options["bids"])
+            # auctions.tests.QueryPlanTests fails if any of these scans a whole table.
+            for name, queryset in hot_queries(user, listing).items():
+                plan = queryset.explain()
+                self.stdout.write(f"{name}:\n  " + plan.replace("\n", "\n  "))
+            transaction.set_rollback(True)  # The seeded rows were only there to give the planner something to plan for.
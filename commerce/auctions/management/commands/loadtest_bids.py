@@ -0,0 +1,71 @@
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from auctions.models import Bid, Listing, User
+from auctions.views import record_bid
+
+
+class Command(BaseCommand):
+    help = "Fires many bids at one throwaway listing from parallel threads and checks that the accepted prices only ever go up."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bids", type=int, default=2000, help="Total number of bids to place.")
+        parser.add_argument("--threads", type=int, default=16, help="Number of bidders bidding at once.")
+
+    def handle(self, *args, **options):
+        # Throwaway bidders with names no real account has, so the cleanup below only ever deletes what was made here.
+        bidders = User.objects.bulk_create(User(username=f"loadtest-{uuid.uuid4().hex}") for _ in range(options["threads"]))
+        listing = Listing.objects.create(title="Load test", description="Load test listing", User=bidders[0])
+        counts = {"accepted": 0, "rejected": 0, "errors": 0}
+        lock = threading.Lock()
+        start_line = threading.Barrier(options["threads"])
+
+        def bidder(user, bids):
+            # Bids climb slowly with a lot of noise, so most bids race others at nearly the same price.
+            try:
+                start_line.wait()
+                for i in range(bids):
+                    price = Decimal(random.randint(i * 90, i * 110 + 500)) / 100
+                    try:
+                        outcome = "accepted" if record_bid(listing, user, price) else "rejected"
+                    except OperationalError:  # SQLite gives up on a lock after its timeout.
+                        outcome = "errors"
+                    with lock:
+                        counts[outcome] += 1
+            finally:
+                connections.close_all()
+
+        per_thread = options["bids"] // options["threads"]
+        threads = [threading.Thread(target=bidder, args=(user, per_thread)) for user in bidders]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        try:
+            prices = list(Bid.objects.filter(Listing=listing).order_by("datetime", "id").values_list("price", flat=True))
+            listing.refresh_from_db()
+            if any(later <= earlier for earlier, later in zip(prices, prices[1:])):
+                raise CommandError("Accepted bids are not strictly increasing.")
+            if len(prices) != counts["accepted"] or listing.bid_count != len(prices):
+                raise CommandError(f"{counts['accepted']} bids accepted but {len(prices)} saved and {listing.bid_count} counted.")
+            if prices and (listing.current_price != prices[-1] or listing.high_bid.price != prices[-1]):
+                raise CommandError("The listing's current price is not its last accepted bid.")
+        finally:
+            listing.delete()
+            User.objects.filter(id__in=[user.id for user in bidders]).delete()
+
+        placed = sum(counts.values())
+        self.stdout.write(
+            f"{placed} bids from {options['threads']} threads in {elapsed:.2f} s ({placed / elapsed:.0f} bids/s): "
+            f"{counts['accepted']} accepted, {counts['rejected']} rejected, {counts['errors']} failed on a lock."
+        )
+        self.stdout.write(self.style.SUCCESS("Accepted prices are strictly increasing and match the listing."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from auctions.models import Listing
+
+
+class Command(BaseCommand):
+    help = "Checks each listing's stored current price, bid count and high bid against its bids, and repairs any that are off."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verify", action="store_true", help="Only report listings that are off, and fail if there are any.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            wrong = [
+                listing for listing in Listing.objects.with_bid_totals().order_by("id")
+                if (listing.current_price, listing.bid_count, listing.high_bid_id)
+                != (listing.latest_price, listing.counted_bids, listing.latest_bid_id)
+            ]
+            for listing in wrong:
+                self.stdout.write(
+                    f"Listing {listing.id}: stored {listing.current_price}, {listing.bid_count} bids, high bid {listing.high_bid_id}; "
+                    f"bids say {listing.latest_price}, {listing.counted_bids} bids, high bid {listing.latest_bid_id}"
+                )
+            if options["verify"]:
+                if wrong:
+                    raise CommandError(f"{len(wrong)} listings have stale bid totals.")
+                self.stdout.write(self.style.SUCCESS("All listings match their bids."))
+                return
+            Listing.objects.filter(id__in=[listing.id for listing in wrong]).recompute_bid_totals()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(wrong)} listings."))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_bid_totals(apps, schema_editor):
+    Listing = apps.get_model('auctions', 'Listing')
+    Bid = apps.get_model('auctions', 'Bid')
+    latest = Bid.objects.filter(Listing=OuterRef('pk')).order_by('-datetime', '-id')
+    counts = Bid.objects.filter(Listing=OuterRef('pk')).order_by().values('Listing').annotate(count=Count('id')).values('count')
+    Listing.objects.update(
+        current_price=Subquery(latest.values('price')[:1]),
+        bid_count=Coalesce(Subquery(counts), 0),
+        high_bid=Subquery(latest.values('id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0004_alter_listing_url_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='current_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='high_bid',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='auctions.bid'),
+        ),
+        migrations.RunPython(fill_bid_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_watchlist_entries(apps, schema_editor):
+    Watchlist = apps.get_model('auctions', 'Watchlist')
+    keep = Watchlist.objects.values('User', 'Listing').annotate(first=Min('id')).values('first')
+    Watchlist.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0005_listing_bid_totals'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bid',
+            name='Listing',
+            field=models.ForeignKey(blank=True, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='bid_listings', to='auctions.listing'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='Listing',
+            field=models.ForeignKey(blank=True, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comment_listings', to='auctions.listing'),
+        ),
+        migrations.AlterField(
+            model_name='watchlist',
+            name='User',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='watchlists', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['Listing', '-datetime', '-id'], name='bid_listing_datetime'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['Listing', '-datetime', '-id'], name='comment_listing_datetime'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['status', 'id'], name='listing_status_id'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['category', 'status', 'id'], name='listing_category_status_id'),
+        ),
+        migrations.RunPython(remove_duplicate_watchlist_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='watchlist',
+            constraint=models.UniqueConstraint(fields=('User', 'Listing'), name='unique_watchlist_listing'),
+        ),
+    ]
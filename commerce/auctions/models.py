@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Coalesce
 
 CATEGORY_CHOICES = [
         ('Fashion', 'Fashion'),
@@ -25,6 +26,28 @@ class Item(models.Model):
     def __str__(self):
         return f"{self.id}: {self.name} at {self.price: .2f} each"
 
+# Works each listing's current price (the latest bid), number of bids and latest bid out from the Bid table.
+# Each is a correlated subquery, so a page of listings costs one query however many listings or bids there are.
+# Pages read the copies kept on Listing instead; manage.py recompute_prices uses this to check and repair them.
+class ListingQuerySet(models.QuerySet):
+    def with_bid_totals(self):
+        latest = Bid.objects.filter(Listing=models.OuterRef("pk")).order_by("-datetime", "-id")
+        counts = Bid.objects.filter(Listing=models.OuterRef("pk")).order_by().values("Listing").annotate(count=models.Count("id")).values("count")
+        return self.annotate(
+            latest_price=models.Subquery(latest.values("price")[:1]),
+            counted_bids=Coalesce(models.Subquery(counts), 0),
+            latest_bid_id=models.Subquery(latest.values("id")[:1]),
+        )
+
+    # Rewrites the stored copies from the Bid table in one UPDATE.
+    def recompute_bid_totals(self):
+        totals = self.model.objects.with_bid_totals().filter(pk=models.OuterRef("pk"))
+        return self.update(
+            current_price=models.Subquery(totals.values("latest_price")),
+            bid_count=models.Subquery(totals.values("counted_bids")),
+            high_bid=models.Subquery(totals.values("latest_bid_id")),
+        )
+
 class Listing(models.Model):
     title = models.CharField(max_length=128)
     description = models.CharField(max_length=512)
@@ -32,6 +55,20 @@ class Listing(models.Model):
     category = models.CharField(max_length=32, choices=CATEGORY_CHOICES, default='Uncategorized')
     status = models.CharField(max_length=32, choices=STATUS_CHOICES, default='Active')
     User = models.ForeignKey(User, on_delete=models.CASCADE, related_name="listings", null=True, blank=True)
+    # Copies of the latest bid's price, the number of bids and the latest bid, kept up to date by views.record_bid,
+    # so browsing never has to look at the Bid table.
+    current_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    bid_count = models.PositiveIntegerField(default=0)
+    high_bid = models.ForeignKey("Bid", on_delete=models.SET_NULL, related_name="+", null=True, blank=True)
+
+    objects = ListingQuerySet.as_manager()
+
+    # Browse pages filter on status, or on category and status, and page through the results by id.
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="listing_status_id"),
+            models.Index(fields=["category", "status", "id"], name="listing_category_status_id"),
+        ]
 
 # Caps at 8 digits, which is 999,999.99.
 # Datetime tracks creation and not modification because bids and comments are not modifiable.
@@ -39,17 +76,35 @@ class Bid(models.Model):
     price = models.DecimalField(max_digits=8, decimal_places=2)
     datetime = models.DateTimeField(auto_now_add=True)
     User = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bids", null=False)
-    Listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="bid_listings", null=False, blank=True)
+    Listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="bid_listings", null=False, blank=True, db_index=False)
+
+    # A listing's bids are always read newest first.  The index starts with Listing, so it also covers the foreign key.
+    class Meta:
+        indexes = [
+            models.Index(fields=["Listing", "-datetime", "-id"], name="bid_listing_datetime"),
+        ]
 
 class Comment(models.Model):
     comment = models.CharField(max_length=512)
     datetime = models.DateTimeField(auto_now_add=True)
     User = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments", null=False)
-    Listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="comment_listings", null=False, blank=True)
+    Listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="comment_listings", null=False, blank=True, db_index=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["Listing", "-datetime", "-id"], name="comment_listing_datetime"),
+        ]
 
 class Watchlist(models.Model):
     datetime = models.DateTimeField(auto_now_add=True)
-    User = models.ForeignKey(User, on_delete=models.CASCADE, related_name="watchlists")
+    User = models.ForeignKey(User, on_delete=models.CASCADE, related_name="watchlists", db_index=False)
     Listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="watched_by")
+
+    # A listing is on a user's watchlist at most once, which also makes get_or_create safe when two requests race.
+    # The constraint's index starts with User, so it also covers the foreign key.
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["User", "Listing"], name="unique_watchlist_listing"),
+        ]
     
 
@@ -0,0 +1,46 @@
+# The auctions app's hot queries and the data to plan them against, shared by manage.py explain_queries, which prints
+# their plans, and auctions.tests.QueryPlanTests, which fails if any of them scans a whole table.
+
+import random
+import uuid
+
+from django.db import connection
+
+from .models import CATEGORY_CHOICES, Bid, Comment, Listing, User, Watchlist
+
+
+# Seeds listings with bids and comments each, plus a few watchlist entries per user, and gathers statistics so the
+# planner prefers an index wherever it has one.  Returns a user and a listing to plan the per-user and per-listing
+# queries for.
+def seed(listings, bids, rng=random):
+    users = User.objects.bulk_create(User(username=f"explain-{uuid.uuid4().hex}") for _ in range(20))
+    categories = [choice[0] for choice in CATEGORY_CHOICES]
+    seeded = Listing.objects.bulk_create(
+        Listing(title=f"Listing {i}", description="Seeded", category=rng.choice(categories),
+                status=rng.choice(["Active", "Active", "Closed"]), User=rng.choice(users))
+        for i in range(listings)
+    )
+    Bid.objects.bulk_create(
+        Bid(price=i + 1, User=rng.choice(users), Listing=listing) for listing in seeded for i in range(bids)
+    )
+    Comment.objects.bulk_create(
+        Comment(comment="Seeded", User=rng.choice(users), Listing=listing) for listing in seeded for i in range(bids)
+    )
+    Watchlist.objects.bulk_create(
+        Watchlist(User=user, Listing=listing) for user in users for listing in rng.sample(seeded, 10)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return users[0], seeded[len(seeded) // 2]
+
+
+def hot_queries(user, listing):
+    return {
+        "active listings": Listing.objects.filter(status="Active").order_by("id"),
+        "category listings": Listing.objects.filter(category="Toys", status="Active").order_by("id"),
+        "bid history": Bid.objects.filter(Listing=listing).order_by("-datetime", "-id"),
+        "comments": Comment.objects.filter(Listing=listing).order_by("-datetime", "-id"),
+        "latest bid": Bid.objects.filter(Listing=listing).order_by("-datetime", "-id")[:1],
+        "watchlist flag": Watchlist.objects.filter(User=user, Listing=listing),
+        "watchlist page": Listing.objects.filter(watched_by__User=user),
+    }
@@ -0,0 +1,29 @@
+// Keeps the price on a listing page current by listening to the listing's bid stream (views.bid_stream).
+// When the listing closes the page reloads to show the winner.  Under WSGI the server ends each response after the
+// current state, and EventSource reconnects after the retry interval it sent, so the page polls instead.
+document.addEventListener('DOMContentLoaded', function () {
+    const price = document.querySelector('[data-bid-stream]');
+    if (!price || !window.EventSource) {
+        return;
+    }
+
+    const stream = new EventSource(price.dataset.bidStream);
+    stream.addEventListener('bid', function (event) {
+        const listing = JSON.parse(event.data);
+        if (listing.status === 'Closed') {
+            stream.close();
+            window.location.reload();
+            return;
+        }
+
+        const label = document.createElement('strong');
+        price.replaceChildren(label);
+        if (listing.price === null) {
+            label.textContent = 'No bids yet';
+        } else {
+            const amount = Number(listing.price).toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+            label.textContent = 'Current Highest Bid:';
+            price.append(` $${amount} (${listing.bid_count} ${listing.bid_count === 1 ? 'bid' : 'bids'})`);
+        }
+    });
+});
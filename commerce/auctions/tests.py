@@ -1,3 +1,184 @@
+import random
+import re
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from commerce.asgi import application
+
+from . import queryplans
+from .live import hub
+from .models import Bid, Comment, Listing, User, Watchlist
+from .views import record_bid
+
+
+# Seeds count active listings owned by user, each with bids prices and on user's watchlist.  The stored price, bid
+# count and high bid are filled in the way views.record_bid keeps them.
+def seed_listings(user, count, bids=3, category="Toys"):
+    listings = Listing.objects.bulk_create(
+        Listing(title=f"Listing {i}", description="Seeded", category=category, User=user) for i in range(count)
+    )
+    Bid.objects.bulk_create(
+        Bid(price=price + 1, User=user, Listing=listing) for listing in listings for price in range(bids)
+    )
+    Watchlist.objects.bulk_create(Watchlist(User=user, Listing=listing) for listing in listings)
+    Listing.objects.filter(id__in=[listing.id for listing in listings]).recompute_bid_totals()
+    return listings
+
+
+class BrowseQueriesTests(TestCase):
+    pages = ["/", "/watchlist/", "/userlistings", "/categories/Toys/"]
+
+    def setUp(self):
+        self.user = User.objects.create(username="seller")
+        self.client.force_login(self.user)
+
+    def query_counts(self):
+        counts = {}
+        for page in self.pages:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(page)
+            self.assertEqual(response.status_code, 200)
+            counts[page] = len(queries)
+        return counts
+
+    # The browse pages run the same queries whether there are a few listings or more than a page of them.
+    def test_query_count_does_not_grow_with_listings(self):
+        seed_listings(self.user, 3)
+        counts = self.query_counts()
+        seed_listings(self.user, 40, bids=10)
+        for page in self.pages:
+            with self.subTest(page=page), self.assertNumQueries(counts[page]):
+                self.assertEqual(self.client.get(page).status_code, 200)
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="seller")
+        self.listings = seed_listings(self.user, 25)
+
+    def test_after_continues_from_a_listing(self):
+        response = self.client.get("/", {"after": self.listings[19].id})
+        self.assertEqual(response.context["listings"], self.listings[20:])
+
+    # Anything but a plain number of ASCII digits that fits the id column starts from the first page.
+    def test_bad_after_starts_from_the_first_page(self):
+        for after in ["²", "-1", " 1", "1e3", "9" * 40]:
+            with self.subTest(after=after):
+                response = self.client.get("/", {"after": after})
+                self.assertEqual(response.context["listings"], self.listings[:20])
+
+
+class StoredPriceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="seller")
+        self.client.force_login(self.user)
+        seed_listings(self.user, 10, bids=50)
+
+    # The price and bid count come from the listing row, so however many bids there are, the index and my listings
+    # pages run the session and user lookups and one page of listings, and never read the Bid table.
+    def test_browse_pages_do_not_read_bids(self):
+        for page in ["/", "/userlistings"]:
+            with self.subTest(page=page):
+                with self.assertNumQueries(3), CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(page)
+                self.assertContains(response, "$50.00")
+                self.assertFalse([query["sql"] for query in queries if "auctions_bid" in query["sql"]])
+
+
+class ListingPageQueriesTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=f"user{i}") for i in range(10)]
+        self.listing = Listing.objects.create(title="Listing", description="Seeded", User=self.users[0])
+        # Signed in as someone other than the owner, so the watchlist check and the owner check run too.
+        self.client.force_login(self.users[1])
+
+    def add_history(self, count):
+        start = self.listing.bid_count
+        Bid.objects.bulk_create(
+            Bid(price=start + i + 1, User=self.users[i % len(self.users)], Listing=self.listing) for i in range(count)
+        )
+        Comment.objects.bulk_create(
+            Comment(comment=f"Comment {i}", User=self.users[i % len(self.users)], Listing=self.listing) for i in range(count)
+        )
+        Listing.objects.filter(id=self.listing.id).recompute_bid_totals()
+        self.listing.refresh_from_db()
+
+    # Bids and comments come in one query each with their users, so the page costs the same few queries however
+    # long the history is.
+    def test_query_budget(self):
+        for count in [2, 1000]:
+            self.add_history(count)
+            # The listing, its bids, its comments, the session, the user and the watchlist check.
+            with self.subTest(count=count), self.assertNumQueries(6):
+                response = self.client.get(f"/listing/{self.listing.id}")
+            self.assertContains(response, f"Comment {count - 1}")
+
+
+# A plan line that reads a whole table instead of going through an index (SQLite and PostgreSQL wording).
+# A SCAN that goes through an index ("SCAN auctions_x USING INDEX ...") walks the index in order and is allowed.
+FULL_SCAN = re.compile(r"\bSCAN (?:TABLE )?auctions_\w+\b(?! USING)|Seq Scan on auctions_\w+")
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.listing = queryplans.seed(1000, 10, rng=random.Random(0))
+
+    def test_full_scan_pattern(self):
+        for line in ["SCAN auctions_listing", "SCAN TABLE auctions_bid", "Seq Scan on auctions_bid  (cost=0.00..1.00)"]:
+            self.assertRegex(line, FULL_SCAN)
+        for line in ["SCAN auctions_listing USING INDEX listing_status_id", "SEARCH auctions_bid USING INDEX bid_listing_datetime (Listing_id=?)"]:
+            self.assertNotRegex(line, FULL_SCAN)
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in queryplans.hot_queries(self.user, self.listing).items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                self.assertIsNone(FULL_SCAN.search(plan), plan)
+
+
+class BidStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="seller")
+        self.listing = Listing.objects.create(title="Listing", description="Seeded", User=self.user)
+
+    # Under WSGI the view answers with the current state and a retry: line and ends, so no thread waits on the hub.
+    def test_wsgi_stream_polls(self):
+        url = f"/bid/{self.listing.id}/stream/"
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response.content, b'retry: 5000\nevent: bid\ndata: {"price": null, "bid_count": 0, "status": "Active"}\n\n')
+        self.assertEqual(hub.count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record_bid(self.listing, self.user, Decimal("12.50"))
+        self.assertContains(self.client.get(url), 'data: {"price": "12.50", "bid_count": 1, "status": "Active"}')
+        self.assertEqual(hub.count(), 0)
+
+    # Under ASGI the stream stays open and each bid is sent as soon as it is committed.
+    async def test_asgi_stream_sends_each_bid(self):
+        communicator = ApplicationCommunicator(application, {
+            "type": "http", "method": "GET", "path": f"/bid/{self.listing.id}/stream/", "headers": []
+        })
+        await communicator.send_input({"type": "http.request"})
+        self.assertEqual((await communicator.receive_output(5))["status"], 200)
+        self.assertIn(b'"bid_count": 0', (await communicator.receive_output(5))["body"])
+
+        await sync_to_async(self.bid)(Decimal("12.50"))
+        self.assertIn(b'"price": "12.50"', (await communicator.receive_output(5))["body"])
+
+        await communicator.send_input({"type": "http.disconnect"})
+        await communicator.wait(5)
+        self.assertFalse(hub.has_subscribers(self.listing.id))
+
+    def bid(self, price):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_bid(self.listing, self.user, price)
 
-# Create your tests here.
+    def test_missing_listing(self):
+        self.assertEqual(self.client.get("/bid/999/stream/").status_code, 404)
@@ -9,6 +9,7 @@ urlpatterns = [
     path("register", views.register, name="register"),
     path("listing/<int:id>", views.listing, name="listing"),
     path('bid/<int:id>/', views.bid, name='bid'),
+    path('bid/<int:id>/stream/', views.bid_stream, name='bid_stream'),
     path("userlistings", views.userlistings, name="userlistings"),
     path("add", views.add, name="add"),
     path('watchlist/add/<int:id>/', views.add_to_watchlist, name='add_to_watchlist'),
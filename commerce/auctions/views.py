@@ -1,32 +1,84 @@
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate, login, logout
-from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Max, Min, Prefetch, Q
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import render
 from django.urls import reverse
 from django import forms
 from auctions.models import CATEGORY_CHOICES
 
+from .live import QUEUE_SIZE, hub
 from .models import User, Listing, Bid, Comment, Watchlist
 
 
-# This wil find the current price for each listing.  It sorts the db by the datetime field and returns the first entry.
-def currentprices(queryset):
-    for listing in queryset:
-        latest_bid = Bid.objects.filter(Listing=listing).order_by('-datetime').first()
-        
-        if latest_bid:
-            listing.current_price = latest_bid.price 
-        else:
-            None
-    return queryset
+# Saves a bid if it beats the listing's current price, and moves the price, bid count and high bid along with it.
+# The check and the price change are one conditional UPDATE, which holds the listing's row until the transaction ends,
+# so two bids racing each other cannot both pass against the same old price.  Returns None if the bid was too low
+# or the listing is closed.
+def record_bid(listing, user, price):
+    with transaction.atomic():
+        raised = Listing.objects.filter(
+            Q(current_price__lt=price) | Q(current_price__isnull=True), id=listing.id, status="Active"
+        ).update(current_price=price, bid_count=F("bid_count") + 1)
+        if not raised:
+            return None
+        bid = Bid.objects.create(
+            price=price,
+            User=user,
+            Listing=listing
+        )
+        Listing.objects.filter(id=listing.id).update(high_bid=bid)
+        publish_listing(listing.id)
+    return bid
+
+
+# Tells the listing's open pages (see bid_stream) its new price, bid count and status once the change is committed.
+# Nothing is read when nobody is watching.
+def publish_listing(listing_id):
+    def publish():
+        if hub.has_subscribers(listing_id):
+            hub.publish(listing_id, listing_state(Listing.objects.values("current_price", "bid_count", "status").get(id=listing_id)))
+    transaction.on_commit(publish)
+
+
+def listing_state(row):
+    return {
+        "price": None if row["current_price"] is None else str(row["current_price"]),
+        "bid_count": row["bid_count"],
+        "status": row["status"]
+    }
+
+
+# The winner is whoever placed the highest bid (the latest one, for a tie), picked from bids that are already loaded.
+def get_listing_winner(listing, bids):
+    if listing.status == "Closed" and bids:
+        return max(bids, key=lambda bid: (bid.price, bid.datetime)).User
+    return None
 
 
-def get_listing_winner(listing):
-    if listing.status == "Closed":
-        winning_bid = Bid.objects.filter(Listing=listing).order_by('-price', '-datetime').first()
-        if winning_bid:
-            return winning_bid.User
-    return None
+# Browse pages show PAGE_SIZE listings at a time, in id order.  A page is "the listings after id N" (?after=N) rather
+# than an offset, so any page is one index range scan and costs the same however deep it is.
+PAGE_SIZE = 20
+
+
+def keyset_page(request, queryset):
+    # ASCII digits only (str.isdigit also accepts "²"), and few enough to fit in a 64-bit integer column.
+    after = request.GET.get("after", "")
+    after = int(after) if re.fullmatch(r"[0-9]{1,18}", after) else None
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    listings = list(queryset.order_by("id")[:PAGE_SIZE + 1])
+    return {
+        "listings": listings[:PAGE_SIZE],
+        "after": after,
+        "next_after": listings[PAGE_SIZE - 1].id if len(listings) > PAGE_SIZE else None
+    }
 
 
 class NewListingForm(forms.Form):
@@ -47,32 +99,27 @@ class NewCommentForm(forms.Form):
 
 # This is the default route and shows only active listings.
 def index(request):
-    listings = currentprices(Listing.objects.filter(status="Active"))
-    print("active listings count:", listings.count()) 
-    return render(request, "auctions/index.html", {
-        "listings": listings,
-        "bids": Bid.objects.all()
-    })
+    # Each listing carries its own current price and bid count, so the bid history is never loaded here.
+    return render(request, "auctions/index.html", keyset_page(request, Listing.objects.filter(status="Active")))
 
 
 # This is the user's own listings, whether active or not.
 def userlistings(request):
-    listings = currentprices(Listing.objects.filter(User=request.user))
-
-    return render(request, "auctions/userlistings.html", {
-        "listings": listings,
-        "bids": Bid.objects.all()
-    })
+    return render(request, "auctions/userlistings.html", keyset_page(request, Listing.objects.filter(User=request.user)))
 
 
 # Provides basic functionality to the listing page by pulling in related table data and 
 # allowing the watchlist button to function.  Calculates the winner of the listing.
+# Bids and comments come in one query each, with their users joined in, so the page costs the same few queries
+# however long the history is.
 def listing(request, id):
-    listing = Listing.objects.get(id=id)
-    listing = currentprices([listing])[0]
-    bids = Bid.objects.filter(Listing=listing).order_by('-datetime')
-    winner = get_listing_winner(listing)
-    comments = Comment.objects.filter(Listing=listing).order_by('-datetime')
+    listing = Listing.objects.select_related("User").prefetch_related(
+        Prefetch("bid_listings", queryset=Bid.objects.select_related("User").order_by('-datetime', '-id'), to_attr="bid_history"),
+        Prefetch("comment_listings", queryset=Comment.objects.select_related("User").order_by('-datetime', '-id'), to_attr="comment_history")
+    ).get(id=id)
+    bids = listing.bid_history
+    winner = get_listing_winner(listing, bids)
+    comments = listing.comment_history
     comment_form = NewCommentForm()
     form = NewBidForm()
     in_watchlist = False
@@ -92,22 +139,19 @@ def listing(request, id):
 #Calculates the bid history for the listing page and allows the user to make a bid.
 def bid(request, id):
     listing = Listing.objects.get(id=id)
-    listing = currentprices([listing])[0]
     if request.method == "POST":
         form = NewBidForm(request.POST)
         if form.is_valid():
                 bid_amount = form.cleaned_data["listingNewBid"]
-                current_price = listing.current_price if listing.current_price else 0
-                if bid_amount > current_price:
-                    Bid.objects.create(
-                        price=bid_amount,
-                        User=request.user,
-                        Listing=listing
-                    )
+                if bid_amount > 0 and record_bid(listing, request.user, bid_amount):
                     return HttpResponseRedirect(reverse("listing", args=[listing.id]))
                 else:
-                    error = "Your bid must be greater than the current highest bid."
-                    bids = Bid.objects.filter(Listing=listing).order_by('-datetime')
+                    listing.refresh_from_db()  # Someone else may have bid in the meantime.
+                    if listing.status == "Closed":
+                        error = "This listing is closed. No further bids are accepted."
+                    else:
+                        error = "Your bid must be greater than the current highest bid."
+                    bids = Bid.objects.filter(Listing=listing).select_related('User').order_by('-datetime', '-id')
                     return render(request, "auctions/listing.html", {
                         "form": form,
                         "listing": listing,
@@ -117,7 +161,7 @@ def bid(request, id):
             
         else:
                     error = "Please enter a bid that is greater than the current highest bid but also less than $10,000,000.00."
-                    bids = Bid.objects.filter(Listing=listing).order_by('-datetime')
+                    bids = Bid.objects.filter(Listing=listing).select_related('User').order_by('-datetime', '-id')
                     return render(request, "auctions/listing.html", {
                         "form": form,
                         "listing": listing,
@@ -138,18 +182,16 @@ def add(request):
         form = NewListingForm(request.POST)
         if  request.user.is_authenticated: 
             if form.is_valid():
-                listing = Listing.objects.create(
-                    title=form.cleaned_data["listingTitle"],
-                    description=form.cleaned_data["listingDesc"],
-                    url_image=form.cleaned_data["listingImgUrl"],
-                    category=form.cleaned_data["listingCategory"],
-                    User=request.user
-                )
-                bid = Bid.objects.create(
-                    price=form.cleaned_data["listingStartBid"],
-                    User=request.user,
-                    Listing=listing
-                )
+                with transaction.atomic():
+                    listing = Listing.objects.create(
+                        title=form.cleaned_data["listingTitle"],
+                        description=form.cleaned_data["listingDesc"],
+                        url_image=form.cleaned_data["listingImgUrl"],
+                        category=form.cleaned_data["listingCategory"],
+                        User=request.user
+                    )
+                    record_bid(listing, request.user, form.cleaned_data["listingStartBid"])
+                    forget_category_facets()
 
                 return HttpResponseRedirect(reverse("listing", args=[listing.id]))
             
@@ -165,6 +207,102 @@ def add(request):
     })
 
 
+# Server-Sent Events stream of a listing's price, bid count and status: the current state first, then every change.
+# Under ASGI, commerce/asgi.py sends this URL to serve_bid_stream, so an idle stream is a coroutine waiting on its
+# queue and not a thread.  A comment line every KEEPALIVE seconds keeps proxies from closing quiet connections.
+KEEPALIVE = 15
+
+# Under runserver and WSGI an open stream would hold a worker thread for as long as the page stays open, so a few
+# tabs could take every thread.  There bid_stream sends the current state with a retry: line and ends the response,
+# and the browser's EventSource asks again after RETRY seconds, which turns the stream into cheap polling.
+RETRY = 5
+
+EVENT_STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+
+def bid_message(state):
+    return f"event: bid\ndata: {json.dumps(state)}\n\n"
+
+
+def bid_stream(request, id):
+    try:
+        row = Listing.objects.values("current_price", "bid_count", "status").get(id=id)
+    except Listing.DoesNotExist:
+        raise Http404()
+    return HttpResponse(
+        f"retry: {RETRY * 1000}\n" + bid_message(listing_state(row)),
+        content_type="text/event-stream", headers=EVENT_STREAM_HEADERS
+    )
+
+
+async def bid_events(listing_id):
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue(QUEUE_SIZE)
+    hub.subscribe(listing_id, loop, events)
+    try:
+        # Read after subscribing, so a bid placed in between is not missed.
+        state = await Listing.objects.values("current_price", "bid_count", "status").aget(id=listing_id)
+        event = listing_state(state)
+        while True:
+            yield bid_message(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), KEEPALIVE)
+                    break
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+    finally:
+        hub.unsubscribe(listing_id, loop, events)
+
+
+# Serves bid_stream as a bare ASGI response.  Django's ASGI handler keeps a thread for each request until it
+# finishes, which for a stream is as long as the page stays open.  Here the database is only used for the opening
+# state, on asgiref's shared thread, and the connection ends when the client disconnects.
+async def serve_bid_stream(listing_id, receive, send):
+    if not await sync_to_async(listing_exists)(listing_id):
+        await send({"type": "http.response.start", "status": 404, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"Not Found"})
+        return
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream")] + [
+            (name.lower().encode(), value.encode()) for name, value in EVENT_STREAM_HEADERS.items()
+        ]
+    })
+    events = bid_events(listing_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        while True:
+            event = asyncio.ensure_future(anext(events))
+            await asyncio.wait({event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                event.cancel()
+                await asyncio.wait({event})  # Lets the generator finish before it is closed.
+                break
+            await send({"type": "http.response.body", "body": event.result().encode(), "more_body": True})
+    finally:
+        disconnected.cancel()
+        await events.aclose()
+
+
+def listing_exists(listing_id):
+    # Runs outside Django's request cycle, so it tidies up database connections the way a request would.
+    close_old_connections()
+    try:
+        return Listing.objects.filter(id=listing_id).exists()
+    finally:
+        close_old_connections()
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
 # Adds listing to watchlist via a conditionally appearing button on the listing page.
 def add_to_watchlist(request, id):
     if request.user.is_authenticated:
@@ -199,6 +337,8 @@ def close_listing(request, id):
         if request.user == listing.User:
             listing.status = "Closed"
             listing.save()
+            forget_category_facets()
+            publish_listing(listing.id)
             return HttpResponseRedirect(reverse("listing", args=[id]))
         else:
             return HttpResponse("Unauthorized", status=403)
@@ -228,27 +368,49 @@ def add_comment(request, id):
 def watchlist(request):
     if request.user.is_authenticated:
         watched_listings = Listing.objects.filter(watched_by__User=request.user)
-        watched_listings = currentprices(watched_listings)
-        return render(request, "auctions/watchlist.html", {
-            "listings": watched_listings
-        })
+        return render(request, "auctions/watchlist.html", keyset_page(request, watched_listings))
     else:
-        return redirect('login')
+        return HttpResponseRedirect(reverse("login"))
+
+
+# Active listing counts and price ranges per category, from one grouped query.  The result is cached and dropped
+# whenever a listing is created or closed.  Bids move the price ranges without dropping it, and the cache is per
+# process by default, so it also expires after FACETS_TIMEOUT seconds.
+FACETS_KEY = "auctions:category_facets"
+FACETS_TIMEOUT = 60
+
+
+def category_facets():
+    facets = cache.get(FACETS_KEY)
+    if facets is None:
+        rows = Listing.objects.filter(status="Active").values("category").annotate(
+            count=Count("id"), low=Min("current_price"), high=Max("current_price")
+        ).order_by()
+        found = {row["category"]: row for row in rows}
+        facets = [
+            found.get(category, {"category": category, "count": 0, "low": None, "high": None})
+            for category, _ in CATEGORY_CHOICES
+        ]
+        cache.set(FACETS_KEY, facets, FACETS_TIMEOUT)
+    return facets
+
+
+def forget_category_facets():
+    transaction.on_commit(lambda: cache.delete(FACETS_KEY))
 
 
-# Provides a list of categories avaialable to browse.
+# Provides a list of categories avaialable to browse, with how many active listings each has and their prices.
 def categories(request):
-    categories = [choice[0] for choice in CATEGORY_CHOICES]
     return render(request, "auctions/categories.html", {
-        "categories": categories
+        "categories": category_facets()
     })
 
 
 # Provides a page for a given category and will show all the active listings for that category.
 def category_listings(request, category):
-    listings = currentprices(Listing.objects.filter(category=category, status="Active"))
+    listings = Listing.objects.filter(category=category, status="Active")
     return render(request, "auctions/category_listings.html", {
-        "listings": listings,
+        **keyset_page(request, listings),
         "category": category
     })
 
@@ -13,4 +13,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up.
+from django.urls import Resolver404, resolve  # noqa: E402
+
+from auctions.views import serve_bid_stream  # noqa: E402
+
+
+# Live bid streams are answered straight from the event loop (see auctions.views.serve_bid_stream), so thousands of
+# open listing pages do not hold a thread each.  Everything else goes to Django.
+async def application(scope, receive, send):
+    if scope["type"] == "http":
+        try:
+            match = resolve(scope["path"])
+        except Resolver404:
+            match = None
+        if match and match.url_name == "bid_stream":
+            return await serve_bid_stream(match.kwargs["id"], receive, send)
+    await django_application(scope, receive, send)
@@ -0,0 +1,146 @@
+"""
+Caches of things derived from an entry: its rendered HTML and its content digest.
+
+Entries are keyed by title plus the entry store's version stamp (for the
+directory store, the file's modification time and size), so a hit does not
+need to read the Markdown at all and a file edited outside the app simply
+misses.  The first tier is a bounded LRU dict inside the process; if
+WIKI_RENDER_CACHE_BACKEND names one of the CACHES, that cache is used as a
+second tier shared between processes.
+
+render_cache holds rendered HTML.  digest_cache holds the SHA-256 of each
+entry's Markdown, which the views use for ETags, so a conditional request can
+be answered without reading the entry.
+
+block_cache is different: it holds the HTML of single blocks of Markdown keyed
+by the block's hash, whatever entry they came from, so an edit to a long entry
+only renders the blocks that changed (see renderer.render_blocks).
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class EntryCache:
+    def __init__(self, name, size=256, backend=None):
+        self.name = name
+        self.size = size
+        self.backend = backend
+        self.entries = OrderedDict()  ## title -> (version, value), least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+
+    def key(self, title, version):
+        ## Titles can hold characters memcached does not allow in keys, so they are hashed.
+        digest = hashlib.sha1(f"{title}\0{version}".encode("utf-8")).hexdigest()
+        return f"encyclopedia:{self.name}:{digest}"
+
+    def get(self, title, version):
+        """
+        Returns the cached value for this version of an entry, or None.
+        """
+        with self.lock:
+            cached = self.entries.get(title)
+            if cached and cached[0] == version:
+                self.entries.move_to_end(title)
+                self.hits += 1
+                return cached[1]
+
+        value = self.backend.get(self.key(title, version)) if self.backend else None
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.backend_hits += 1
+        self.remember(title, version, value)
+        return value
+
+    def set(self, title, version, value):
+        self.remember(title, version, value)
+        if self.backend:
+            self.backend.set(self.key(title, version), value)
+
+    def remember(self, title, version, value):
+        with self.lock:
+            self.entries[title] = (version, value)
+            self.entries.move_to_end(title)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, title, version=None):
+        """
+        Drops an entry so the next read renders it again.  Pass the version
+        that was on disk before a save so the shared tier forgets it too.
+        """
+        with self.lock:
+            self.entries.pop(title, None)
+        if self.backend and version is not None:
+            self.backend.delete(self.key(title, version))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.backend_hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "backend_hits": self.backend_hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "size": self.size,
+            }
+
+
+class BlockCache:
+    """
+    Bounded LRU dict of block hash -> rendered HTML, limited by the total
+    length of the HTML it holds.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            html = self.blocks.get(key)
+            if html is not None:
+                self.blocks.move_to_end(key)
+            return html
+
+    def set(self, key, html):
+        if len(html) > self.size:
+            return
+        with self.lock:
+            if key in self.blocks:
+                return
+            self.blocks[key] = html
+            self.used += len(html)
+            while self.used > self.size:
+                _, dropped = self.blocks.popitem(last=False)
+                self.used -= len(dropped)
+
+    def clear(self):
+        with self.lock:
+            self.blocks.clear()
+            self.used = 0
+
+
+def build_cache(name, size):
+    backend = getattr(settings, "WIKI_RENDER_CACHE_BACKEND", None)
+    return EntryCache(name, size=size, backend=caches[backend] if backend else None)
+
+
+render_cache = build_cache("html", getattr(settings, "WIKI_RENDER_CACHE_SIZE", 256))
+digest_cache = build_cache("digest", 4096)  ## Digests are small, so many more fit.
+block_cache = BlockCache(getattr(settings, "WIKI_BLOCK_CACHE_SIZE", 32 * 2**20))
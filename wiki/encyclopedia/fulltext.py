@@ -0,0 +1,204 @@
+"""
+Full-text search over entry content.
+
+The inverted index lives in its own SQLite file (WIKI_SEARCH_INDEX) with one
+row per (term, entry) holding how often the term appears.  Results are ranked
+with BM25, computed inside SQLite so only one page of results comes back to
+Python.  save_entry re-indexes the entry it saved; manage.py
+rebuild_search_index rebuilds everything from entries/.
+"""
+
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .sqlite import ThreadConnections
+
+## BM25 parameters, the usual defaults.
+K1 = 1.2
+B = 0.75
+
+MAX_TERM_LENGTH = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    document INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    frequency INTEGER NOT NULL,
+    PRIMARY KEY (term, document)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_document ON postings (document);
+"""
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase words.  Link targets are dropped so every entry
+    that links to /wiki/... does not match "wiki".
+    """
+    text = re.sub(r"\]\([^)\s]*\)", " ", text)
+    return [word for word in re.findall(r"\w+", text.lower()) if len(word) <= MAX_TERM_LENGTH]
+
+
+def snippet(content, query, width=80):
+    """
+    Returns an escaped excerpt of content around the first query term it
+    contains, with every query term wrapped in mark tags.
+    """
+    terms = sorted(set(tokenize(query)), key=len, reverse=True)
+    if not terms:
+        return ""
+    pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in terms) + r")\b", re.IGNORECASE)
+    found = pattern.search(content)
+    start = max(0, found.start() - width) if found else 0
+    end = min(len(content), (found.end() if found else 0) + width)
+    excerpt = " ".join(content[start:end].split())
+
+    parts = []
+    pos = 0
+    for match in pattern.finditer(excerpt):
+        parts.append(escape(excerpt[pos:match.start()]))
+        parts.append(f"<mark>{escape(match.group(0))}</mark>")
+        pos = match.end()
+    parts.append(escape(excerpt[pos:]))
+    return mark_safe(("..." if start > 0 else "") + "".join(parts) + ("..." if end < len(content) else ""))
+
+
+class SearchResults:
+    """
+    Ranked results for a query, sliced lazily so it can be handed to a
+    Paginator.  Each result is a (title, score) tuple.
+    """
+
+    def __init__(self, index, query):
+        self.index = index
+        self.terms = sorted(set(tokenize(query)))
+        self.total = None
+
+    def count(self):
+        if self.total is None:
+            self.total = self.index.count(self.terms)
+        return self.total
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, page):
+        start = page.start or 0
+        return self.index.ranked(self.terms, start, page.stop - start)
+
+
+class FullTextIndex:
+    def __init__(self, path):
+        self.path = path
+        self.connections = ThreadConnections(path, "PRAGMA foreign_keys = ON;" + SCHEMA)
+
+    @property
+    def connection(self):
+        return self.connections.get()
+
+    def is_empty(self):
+        return self.connection.execute("SELECT 1 FROM documents LIMIT 1").fetchone() is None
+
+    def add(self, title, content):
+        """
+        Indexes an entry, replacing whatever was indexed for it before.
+        """
+        with self.connection as connection:
+            self.write(connection, title, content)
+
+    def add_many(self, entries):
+        """
+        Indexes many (title, content) pairs in one transaction.
+        """
+        with self.connection as connection:
+            for title, content in entries:
+                self.write(connection, title, content)
+
+    def rebuild(self, entries):
+        """
+        Replaces the whole index with the given (title, content) pairs, in one
+        transaction.
+        """
+        with self.connection as connection:
+            connection.execute("DELETE FROM postings")
+            connection.execute("DELETE FROM documents")
+            for title, content in entries:
+                self.write(connection, title, content)
+
+    def write(self, connection, title, content):
+        words = tokenize(f"{title}\n{content}")
+        connection.execute(
+            "INSERT INTO documents (title, length) VALUES (?, ?) "
+            "ON CONFLICT (title) DO UPDATE SET length = excluded.length",
+            (title, len(words)),
+        )
+        (document,) = connection.execute("SELECT id FROM documents WHERE title = ?", (title,)).fetchone()
+        connection.execute("DELETE FROM postings WHERE document = ?", (document,))
+        connection.executemany(
+            "INSERT INTO postings (term, document, frequency) VALUES (?, ?, ?)",
+            ((term, document, frequency) for term, frequency in Counter(words).items()),
+        )
+
+    def remove(self, title):
+        with self.connection as connection:
+            connection.execute("DELETE FROM documents WHERE title = ?", (title,))
+
+    def count(self, terms):
+        if not terms:
+            return 0
+        marks = ", ".join(["?"] * len(terms))
+        return self.connection.execute(
+            f"SELECT COUNT(DISTINCT document) FROM postings WHERE term IN ({marks})", terms
+        ).fetchone()[0]
+
+    def ranked(self, terms, offset, limit):
+        """
+        Returns (title, score) for one page of entries matching any of the
+        terms, best BM25 score first.
+        """
+        if not terms:
+            return []
+        connection = self.connection
+        marks = ", ".join(["?"] * len(terms))
+        documents, average = connection.execute("SELECT COUNT(*), AVG(length) FROM documents").fetchone()
+        frequencies = connection.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE term IN ({marks}) GROUP BY term", terms
+        ).fetchall()
+        if not frequencies:
+            return []
+
+        weights = []
+        for term, found in frequencies:
+            weights.extend((term, math.log(1 + (documents - found + 0.5) / (found + 0.5))))
+        rows = ", ".join(["(?, ?)"] * len(frequencies))
+        return connection.execute(
+            f"""
+            WITH weights (term, idf) AS (VALUES {rows})
+            SELECT documents.title,
+                   SUM(weights.idf * postings.frequency * {K1 + 1}
+                       / (postings.frequency + {K1} * (1 - {B} + {B} * documents.length / ?))) AS score
+            FROM weights
+            JOIN postings ON postings.term = weights.term
+            JOIN documents ON documents.id = postings.document
+            GROUP BY documents.id
+            ORDER BY score DESC, documents.title
+            LIMIT ? OFFSET ?
+            """,
+            weights + [average or 1.0, limit, offset],
+        ).fetchall()
+
+    def search(self, query):
+        return SearchResults(self, query)
+
+
+search_index = FullTextIndex(settings.WIKI_SEARCH_INDEX)
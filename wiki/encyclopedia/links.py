@@ -0,0 +1,105 @@
+"""
+Index of which entries link to which.
+
+Every [text](/wiki/Title) link in an entry is stored as a (source, target) row
+in its own SQLite file (WIKI_LINK_INDEX).  save_entry compares the links the
+entry had before with the ones it has now and only writes the difference.
+"What links here" and the orphaned pages report read from the index, so
+neither has to open or render any entries.
+"""
+
+from urllib.parse import unquote
+
+from django.conf import settings
+
+from .renderer import link_targets
+from .sqlite import ThreadConnections
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    title TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS links (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    PRIMARY KEY (source, target)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS links_target ON links (target, source);
+"""
+
+
+def outgoing(content):
+    """
+    Returns the titles of the entries an entry links to.
+    """
+    return {unquote(url[len("/wiki/"):]) for url in link_targets(content)
+            if url.startswith("/wiki/") and len(url) > len("/wiki/")}
+
+
+class LinkGraph:
+    def __init__(self, path):
+        self.path = path
+        self.connections = ThreadConnections(path, SCHEMA)
+
+    @property
+    def connection(self):
+        return self.connections.get()
+
+    def is_empty(self):
+        return self.connection.execute("SELECT 1 FROM sources LIMIT 1").fetchone() is None
+
+    def update(self, title, content):
+        """
+        Records an entry's links, writing only the ones that were added or
+        removed since it was last indexed.
+        """
+        with self.connection as connection:
+            self.write(connection, title, content)
+
+    def update_many(self, entries):
+        """
+        Records the links of many (title, content) pairs in one transaction.
+        """
+        with self.connection as connection:
+            for title, content in entries:
+                self.write(connection, title, content)
+
+    def rebuild(self, entries):
+        """
+        Replaces the whole index with the links in the given (title, content)
+        pairs, in one transaction.
+        """
+        with self.connection as connection:
+            connection.execute("DELETE FROM links")
+            connection.execute("DELETE FROM sources")
+            for title, content in entries:
+                self.write(connection, title, content)
+
+    def write(self, connection, title, content):
+        connection.execute("INSERT OR IGNORE INTO sources (title) VALUES (?)", (title,))
+        before = {target for (target,) in connection.execute("SELECT target FROM links WHERE source = ?", (title,))}
+        after = outgoing(content)
+        connection.executemany("DELETE FROM links WHERE source = ? AND target = ?",
+                               ((title, target) for target in before - after))
+        connection.executemany("INSERT INTO links (source, target) VALUES (?, ?)",
+                               ((title, target) for target in after - before))
+
+    def backlinks(self, title):
+        """
+        Returns the titles of the entries that link to title, in order.
+        """
+        return [source for (source,) in self.connection.execute(
+            "SELECT source FROM links WHERE target = ? AND source != target ORDER BY source", (title,))]
+
+    def linked(self, exists=None):
+        """
+        Returns the set of titles that at least one other entry links to.  If
+        exists is given, links from entries it rejects (say, entries deleted
+        outside the app) are not counted.
+        """
+        return {target for source, target in self.connection.execute(
+            "SELECT source, target FROM links WHERE source != target")
+            if exists is None or exists(source)}
+
+
+link_graph = LinkGraph(settings.WIKI_LINK_INDEX)
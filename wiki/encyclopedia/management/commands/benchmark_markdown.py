@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from encyclopedia import renderer, util
+from encyclopedia.cache import BlockCache
+
+
+class Command(BaseCommand):
+    help = "Checks the single-pass renderer against the regex renderer and times both on large entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,100,1000", help="Comma separated entry sizes in KB.")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per size.")
+        parser.add_argument("--edit-size", type=int, default=1024, help="Size in KB of the entry used for the small edit benchmark.")
+
+    def handle(self, *args, **options):
+        titles = util.list_entries()
+        entries = [util.get_entry(title) for title in titles]
+
+        # Both renderers have to agree on every entry before the timings mean anything.
+        for title, content in zip(titles, entries):
+            if renderer.render(content) != renderer.render_regex(content):
+                raise CommandError(f"Renderers disagree on {title}.")
+        self.stdout.write(f"Renderers agree on all {len(entries)} entries.")
+
+        corpus = "\n\n".join(entries)
+        for size in options["sizes"].split(","):
+            size = int(size) * 1024
+            content = (corpus * (size // len(corpus) + 1))[:size]
+            for name, render in (("regex", renderer.render_regex), ("single-pass", renderer.render)):
+                best = min(self.time(render, content) for _ in range(options["repeat"]))
+                self.stdout.write(
+                    f"{size // 1024:>6} KB  {name:<12} {best * 1000:9.2f} ms  {size / best / 2**20:8.2f} MB/s"
+                )
+
+        self.edit(options["edit_size"] * 1024, options["repeat"])
+
+    def edit(self, size, repeat):
+        """
+        Times re-rendering a large entry after one paragraph changed, from
+        scratch and through the block cache.
+        """
+        sections = []
+        length = 0
+        while length < size:
+            i = len(sections)
+            sections.append(f"## Section {i}\n\nParagraph {i} has **bold**, *italics* and a [link](/wiki/Entry{i}).\n\n- item {i}\n- another item\n")
+            length += len(sections[-1]) + 1
+        before = "\n".join(sections)
+        middle = len(sections) // 2
+        sections[middle] = sections[middle].replace("has **bold**", "now has **bold**")
+        after = "\n".join(sections)
+
+        cache = BlockCache(4 * size)
+        renderer.render_blocks(before, cache)
+        if renderer.render_blocks(after, cache) != renderer.render(after):
+            raise CommandError("Block rendering does not match rendering the whole entry.")
+
+        full = min(self.time(renderer.render, after) for _ in range(repeat))
+        blocks = min(self.time(lambda content: renderer.render_blocks(content, cache), after) for _ in range(repeat))
+        self.stdout.write(f"Small edit to a {len(after) // 1024} KB entry:")
+        self.stdout.write(f"  whole entry  {full * 1000:9.2f} ms")
+        self.stdout.write(f"  changed blocks {blocks * 1000:7.2f} ms")
+
+    def time(self, render, content):
+        start = time.perf_counter()
+        render(content)
+        return time.perf_counter() - start
@@ -0,0 +1,51 @@
+import os
+import random
+import re
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from encyclopedia.stores import DirectoryStore
+from encyclopedia.titles import TitleIndex
+
+
+class Command(BaseCommand):
+    help = "Times picking a random entry from a generated entries directory, old way against the title index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=100000, help="Number of entries to generate.")
+        parser.add_argument("--draws", type=int, default=20, help="Number of random picks to time.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as root:
+            os.mkdir(os.path.join(root, "entries"))
+            for i in range(options["entries"]):
+                open(os.path.join(root, "entries", f"Entry {i}.md"), "w").close()
+            storage = FileSystemStorage(location=root)
+            self.stdout.write(f"Generated {options['entries']} entries.")
+
+            start = time.perf_counter()
+            for _ in range(options["draws"]):
+                self.scan(storage, "Entry 0")
+            self.report("listdir and retry", start, options["draws"])
+
+            index = TitleIndex(DirectoryStore(storage))
+            index.titles()
+            start = time.perf_counter()
+            for _ in range(options["draws"]):
+                index.random(exclude="Entry 0")
+            self.report("title index", start, options["draws"])
+
+    def scan(self, storage, current_title):
+        # What randomPage used to do on every click.
+        _, filenames = storage.listdir("entries")
+        entries = sorted(re.sub(r"\.md$", "", filename) for filename in filenames if filename.endswith(".md"))
+        while True:
+            entry = random.choice(entries)
+            if entry != current_title:
+                return entry
+
+    def report(self, name, start, draws):
+        self.stdout.write(f"{name:<18} {(time.perf_counter() - start) / draws * 1000:10.4f} ms per pick")
@@ -0,0 +1,40 @@
+import os
+import random
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from encyclopedia.stores import DirectoryStore, SQLiteStore
+
+
+class Command(BaseCommand):
+    help = "Compares the directory and SQLite entry stores on a generated wiki."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=10000, help="Number of entries to generate.")
+        parser.add_argument("--lookups", type=int, default=2000, help="Number of reads and existence checks to time.")
+
+    def handle(self, *args, **options):
+        content = "# Entry\n\nSome **text** with a [link](/wiki/Entry).\n" * 20
+        titles = [f"Entry {i}" for i in range(options["entries"])]
+        sample = random.sample(titles, min(options["lookups"], len(titles)))
+
+        with tempfile.TemporaryDirectory() as root:
+            os.mkdir(os.path.join(root, "entries"))
+            stores = {
+                "directory": DirectoryStore(FileSystemStorage(location=root)),
+                "sqlite": SQLiteStore(os.path.join(root, "entries.sqlite3")),
+            }
+            for name, store in stores.items():
+                self.stdout.write(f"{name}:")
+                self.time("  write", lambda: [store.write(title, content) for title in titles], len(titles))
+                self.time("  list", store.titles, 1)
+                self.time("  version", lambda: [store.version(title) for title in sample], len(sample))
+                self.time("  read", lambda: [store.read(title) for title in sample], len(sample))
+
+    def time(self, name, run, count):
+        start = time.perf_counter()
+        run()
+        self.stdout.write(f"{name:<10} {(time.perf_counter() - start) / count * 1000:10.4f} ms each")
@@ -0,0 +1,28 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from encyclopedia.stores import DirectoryStore, SQLiteStore
+
+
+class Command(BaseCommand):
+    help = "Copies every entry from the entries directory into a SQLite entry store, or back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("direction", choices=["to-sqlite", "to-directory"])
+        parser.add_argument("--database", default=os.path.join(settings.BASE_DIR, "entries.sqlite3"),
+                            help="SQLite file to copy to or from.")
+
+    def handle(self, *args, **options):
+        directory = DirectoryStore()
+        database = SQLiteStore(options["database"])
+        if options["direction"] == "to-sqlite":
+            source, target = directory, database
+        else:
+            source, target = database, directory
+
+        titles = source.titles()
+        for title in titles:
+            target.write(title, source.read(title))
+        self.stdout.write(self.style.SUCCESS(f"Copied {len(titles)} entries {options['direction']}."))
@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import django
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template, render_to_string
+
+from encyclopedia import util
+
+MANIFEST = "manifest.json"
+TEMPLATES = ["encyclopedia/layout.html", "encyclopedia/entry.html", "encyclopedia/index.html"]
+ENTRY_LINK = re.compile(r'href="/wiki/([^"/?#]+)"')
+
+
+def setup_worker():
+    django.setup()
+
+
+def write_page(path, html):
+    """
+    Writes a page and a gzipped copy next to it, each through a temporary file
+    so a file server never sees half a page.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = html.encode("utf-8")
+    for target, body in ((path, data), (f"{path}.gz", gzip.compress(data, mtime=0))):
+        with open(f"{target}.tmp", "wb") as f:
+            f.write(body)
+        os.replace(f"{target}.tmp", target)
+
+
+def render_page(template, context):
+    """
+    Renders a page for the exported site.  The templates leave out what only
+    the running app can answer (search, editing, random and orphaned pages),
+    and links to entries point at their .html files.
+    """
+    html = render_to_string(template, {**context, "static_export": True})
+    return ENTRY_LINK.sub(r'href="/wiki/\1.html"', html)
+
+
+def export_entry(output, title, content, backlinks):
+    # Runs in a worker process.
+    html = render_page("encyclopedia/entry.html", {
+        "content": util.markdown_to_html(content),
+        "title": title,
+        "backlinks": backlinks
+    })
+    write_page(os.path.join(output, "wiki", f"{title}.html"), html)
+    return title
+
+
+class Command(BaseCommand):
+    help = "Renders the whole encyclopedia to static HTML files, skipping entries that have not changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Directory to write the site to.")
+        parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Number of worker processes.")
+        parser.add_argument("--force", action="store_true", help="Render every entry even if it has not changed.")
+
+    def handle(self, *args, **options):
+        output = os.path.abspath(options["output"])
+        manifest_path = os.path.join(output, MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+
+        # A change to the templates changes every page.
+        templates = hashlib.sha256("".join(get_template(name).template.source for name in TEMPLATES).encode("utf-8")).hexdigest()
+        previous = {} if options["force"] or manifest.get("templates") != templates else manifest.get("entries", {})
+
+        titles = [title for title in util.list_entries() if "/" not in title and not title.startswith(".")]
+        entries = {}
+        changed = []
+        for title in titles:
+            content = util.get_entry(title)
+            if content is None:
+                continue
+            backlinks = util.backlinks(title)
+            entries[title] = hashlib.sha256("\0".join([content] + backlinks).encode("utf-8")).hexdigest()
+            if previous.get(title) != entries[title] or not os.path.exists(os.path.join(output, "wiki", f"{title}.html")):
+                changed.append((title, content, backlinks))
+
+        if changed:
+            with ProcessPoolExecutor(max_workers=options["jobs"], initializer=setup_worker) as pool:
+                for title in pool.map(export_entry, repeat(output), *zip(*changed), chunksize=16):
+                    if options["verbosity"] > 1:
+                        self.stdout.write(f"Rendered {title}")
+
+        for title in set(previous) - set(entries):
+            for suffix in (".html", ".html.gz"):
+                path = os.path.join(output, "wiki", f"{title}{suffix}")
+                if os.path.exists(path):
+                    os.remove(path)
+
+        write_page(os.path.join(output, "index.html"), render_page("encyclopedia/index.html", {
+            "entries": list(entries)
+        }))
+        self.copy_static(output)
+
+        with open(f"{manifest_path}.tmp", "w") as f:
+            json.dump({"templates": templates, "entries": entries}, f, indent=1, sort_keys=True)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(entries)} entries to {output}: {len(changed)} rendered, {len(entries) - len(changed)} unchanged."
+        ))
+
+    def copy_static(self, output):
+        for finder in get_finders():
+            for path, storage in finder.list([]):
+                target = os.path.join(output, "static", path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with storage.open(path) as source, open(target, "wb") as f:
+                    shutil.copyfileobj(source, f)
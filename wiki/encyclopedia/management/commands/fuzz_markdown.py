@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from encyclopedia import renderer
+
+
+# Each of these builds an entry of roughly n characters that used to make the
+# regex renderer backtrack, or that stresses one part of the single-pass one.
+PATHOLOGICAL = {
+    "unclosed bold": lambda n: "**a " * (n // 4),
+    "stars": lambda n: "*" * n,
+    "unclosed links": lambda n: "[a](" * (n // 4),
+    "open brackets": lambda n: "[a " * (n // 3),
+    "unordered list": lambda n: "- item\n" * (n // 7),
+    "ordered list": lambda n: "1. item\n" * (n // 8),
+    "spaced list": lambda n: "- a\n   \n" * (n // 8),
+    "dashes": lambda n: "- " * (n // 2),
+    "indentation": lambda n: " " * n + "x",
+    "headings": lambda n: "# **a* [b](c\n" * (n // 13),
+}
+
+# Small enough that the regex renderer finishes quickly on anything generated.
+ATOMS = ["# ", "## ", "### ", "- ", "* ", "+ ", "1. ", "**", "*", "[", "]", "(", ")", "](",
+         "a", "bc", " ", "\t", "\n", "\n\n", "\r", "<ul>", "<p", "-", "1", "."]
+
+
+def ms_per_kb(render, content, repeat=5):
+    """
+    Returns the time render takes per KB of content, best of repeat runs so a
+    stray pause does not count.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000 / (len(content) / 1024)
+
+
+class Command(BaseCommand):
+    help = "Feeds pathological entries to the renderer and fails if it is not linear time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=256, help="Size in KB of the largest generated entry.")
+        parser.add_argument("--max-ms-per-kb", type=float, default=5.0, help="Time allowed per KB of input.")
+        parser.add_argument("--max-growth", type=float, default=3.0,
+                            help="How much slower per KB the largest entry may be than one an eighth of its size.")
+        parser.add_argument("--random", type=int, default=20000, help="Number of random entries to compare with the regex renderer.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        failures = []
+        size = options["size"] * 1024
+
+        for name, build in PATHOLOGICAL.items():
+            small = ms_per_kb(renderer.render, build(size // 8))
+            large = ms_per_kb(renderer.render, build(size))
+            self.stdout.write(f"{name:<16} {small:8.4f} ms/KB at {size // 8 // 1024} KB  {large:8.4f} ms/KB at {size // 1024} KB")
+            if large > options["max_ms_per_kb"]:
+                failures.append(f"{name}: {large:.4f} ms/KB is over the limit of {options['max_ms_per_kb']} ms/KB")
+            if large > small * options["max_growth"]:
+                failures.append(f"{name}: {large / small:.1f}x slower per KB at {size // 1024} KB, rendering is not linear")
+
+        rng = random.Random(options["seed"])
+        for _ in range(options["random"]):
+            content = "".join(rng.choice(ATOMS) for _ in range(rng.randint(0, 40)))
+            if renderer.render(content) != renderer.render_regex(content):
+                failures.append(f"renderers disagree on {content!r}")
+                break
+        self.stdout.write(f"Compared {options['random']} random entries with the regex renderer.")
+
+        if failures:
+            raise CommandError("\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("Rendering is linear time."))
@@ -0,0 +1,110 @@
+import os
+import tarfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from encyclopedia import renderer, util
+
+MAX_TITLE_LENGTH = 200  ## Leaves room for ".md" and the temporary file names under the usual 255 byte limit.
+
+
+def setup_worker():
+    django.setup()
+
+
+def title_problem(title):
+    """
+    Returns why title cannot be an entry title, or None if it can.
+    """
+    if not title.strip():
+        return "empty title"
+    if title.startswith("."):
+        return "title starts with a dot"
+    if any(character in title for character in "/\\\0"):
+        return "title contains a slash or a NUL"
+    if len(title.encode("utf-8")) > MAX_TITLE_LENGTH:
+        return "title is too long"
+    return None
+
+
+def check_entry(title, source):
+    # Runs in a worker process.  source is the entry's bytes, or the path to read them from.
+    problem = title_problem(title)
+    if problem:
+        return title, None, problem
+    try:
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                source = f.read()
+        content = source.decode("utf-8")
+        renderer.render(content)
+    except UnicodeDecodeError as error:
+        return title, None, f"not UTF-8 ({error.reason} at byte {error.start})"
+    except Exception as error:
+        return title, None, f"{type(error).__name__}: {error}"
+    return title, content, None
+
+
+def directory_entries(path):
+    for item in sorted(os.scandir(path), key=lambda item: item.name):
+        if item.is_file() and item.name.endswith(".md"):
+            yield item.name[:-len(".md")], item.path
+
+
+def tarball_entries(path):
+    # Members are read from the archive, never extracted, so their paths do not matter.
+    with tarfile.open(path) as archive:
+        for member in archive:
+            name = os.path.basename(member.name)
+            if member.isfile() and name.endswith(".md"):
+                yield name[:-len(".md")], archive.extractfile(member).read()
+
+
+class Command(BaseCommand):
+    help = "Imports entries from a directory or a tarball of <title>.md files, checking them in parallel and saving them in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Directory or tar file (optionally compressed) to import from.")
+        parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Number of worker processes.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Entries checked and saved per batch.")
+        parser.add_argument("--skip-existing", action="store_true", help="Leave entries that already exist alone.")
+        parser.add_argument("--dry-run", action="store_true", help="Only check the entries.")
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        if os.path.isdir(source):
+            entries = directory_entries(source)
+        elif os.path.isfile(source) and tarfile.is_tarfile(source):
+            entries = tarball_entries(source)
+        else:
+            raise CommandError(f"{source} is neither a directory nor a tar file.")
+
+        imported = replaced = skipped = 0
+        rejected = []
+        with ProcessPoolExecutor(max_workers=options["jobs"], initializer=setup_worker) as pool:
+            # One batch at a time, so a large tarball is never read into memory whole.
+            while batch := list(islice(entries, options["batch_size"])):
+                checked = {}
+                for title, content, problem in pool.map(check_entry, *zip(*batch)):
+                    if problem:
+                        rejected.append((title, problem))
+                    elif options["skip_existing"] and util.entry_exists(title):
+                        skipped += 1
+                    else:
+                        checked[title] = content  ## A title given twice keeps its last content.
+                replaced += sum(1 for title in checked if util.entry_exists(title))
+                imported += len(checked)
+                if checked and not options["dry_run"]:
+                    util.save_entries(checked.items())
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"Checked {len(batch)} entries, {imported} so far.")
+
+        for title, problem in rejected:
+            self.stderr.write(f"Rejected {title}: {problem}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Checked' if options['dry_run'] else 'Imported'} {imported} entries ({replaced} replacing existing ones), "
+            f"skipped {skipped}, rejected {len(rejected)}."
+        ))
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from encyclopedia import util
+
+
+class Command(BaseCommand):
+    help = "Requests every entry page repeatedly, with and without If-None-Match, and compares bytes sent and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=20, help="Number of times each page is requested.")
+
+    def handle(self, *args, **options):
+        if "testserver" not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS.append("testserver")
+        client = Client()
+        urls = [reverse("index")] + [reverse("entry", args=[title]) for title in util.list_entries()]
+        etags = {url: client.get(url)["ETag"] for url in urls}
+
+        for name, headers in (("full responses", lambda url: {}),
+                              ("conditional", lambda url: {"HTTP_IF_NONE_MATCH": etags[url]})):
+            sent = 0
+            not_modified = 0
+            start = time.perf_counter()
+            for _ in range(options["rounds"]):
+                for url in urls:
+                    response = client.get(url, **headers(url))
+                    sent += len(response.content)
+                    not_modified += response.status_code == 304
+            elapsed = time.perf_counter() - start
+            requests = options["rounds"] * len(urls)
+            self.stdout.write(
+                f"{name:<15} {requests} requests  {sent} body bytes  {not_modified} x 304  "
+                f"{elapsed / requests * 1000:.3f} ms per request"
+            )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from encyclopedia import util
+from encyclopedia.fulltext import search_index
+from encyclopedia.links import link_graph
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index and the link index from the entry store."
+
+    def handle(self, *args, **options):
+        titles = util.list_entries()
+        search_index.rebuild((title, util.get_entry(title)) for title in titles)
+        link_graph.rebuild((title, util.get_entry(title)) for title in titles)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {len(titles)} entries."))
@@ -0,0 +1,327 @@
+"""
+Markdown rendering for encyclopedia entries.
+
+render() walks the entry once, line by line, and builds the HTML in a single
+buffer.  It produces the same output as the original chain of re.sub passes
+(kept below as render_regex for comparison and benchmarking), including its
+quirks, so existing entries look exactly as they did before.
+
+render() runs in linear time on any input: every line is scanned a fixed
+number of times with str.find and two anchored regexes that cannot
+backtrack.  render_regex() does not have that guarantee (an unclosed "[a]("
+repeated a few thousand times takes it minutes), so it must not be used on
+user input.  manage.py fuzz_markdown checks both claims.
+"""
+
+import hashlib
+import re
+
+
+## Lines starting with one of these are left alone by the paragraph rule.
+BLOCK_PREFIXES = tuple(
+    f"<{slash}{tag}"
+    for slash in ("", "/")
+    for tag in ("ul", "ol", "li", "h1", "h2", "h3", "h4", "h5", "h6", "p", "strong", "em")
+)
+
+HEADINGS = (("# ", "h1"), ("## ", "h2"), ("### ", "h3"))
+
+UNORDERED_ITEM = re.compile(r"[*+-] .")  ## Only ever used with search() on a single line, so it cannot backtrack.
+ORDERED_ITEM = re.compile(r"\d+\. .")
+BLANK_LINES = re.compile(r"\n(?:[^\S\n]*\n)+")  ## A line break followed by one or more blank lines.
+
+
+def is_blank(line):
+    return not line or line.isspace()
+
+
+def paragraph(line):
+    """
+    Wraps a line in p tags unless it is too short, starts with whitespace or
+    starts with one of the block tags.
+    """
+    if len(line) > 1 and not line[0].isspace() and not line.startswith(BLOCK_PREFIXES):
+        return f"<p>{line}</p>"
+    return line
+
+
+def pair(line, marker, tag):
+    """
+    Replaces each marker...marker pair in a line with an HTML tag.  Pairs are
+    matched left to right like the lazy regex did.
+    """
+    parts = []
+    pos = 0
+    size = len(marker)
+    while True:
+        start = line.find(marker, pos)
+        if start < 0:
+            break
+        end = line.find(marker, start + size)
+        if end < 0:
+            break
+        parts.append(line[pos:start])
+        parts.append(f"<{tag}>{line[start + size:end]}</{tag}>")
+        pos = end + size
+    if not parts:
+        return line
+    parts.append(line[pos:])
+    return "".join(parts)
+
+
+def links(line):
+    """
+    Replaces each [text](url) in a line with an anchor tag.
+    """
+    parts = []
+    pos = 0
+    while True:
+        start = line.find("[", pos)
+        if start < 0:
+            break
+        middle = line.find("](", start + 1)
+        if middle < 0:
+            break
+        end = line.find(")", middle + 2)
+        if end < 0:
+            break
+        parts.append(line[pos:start])
+        parts.append(f'<a href="{line[middle + 2:end]}">{line[start + 1:middle]}</a>')
+        pos = end + 1
+    if not parts:
+        return line
+    parts.append(line[pos:])
+    return "".join(parts)
+
+
+def link_targets(content):
+    """
+    Yields the url of every [text](url) link in an entry, found the same way
+    links() finds them.
+    """
+    for line in content.split("\n"):
+        pos = 0
+        while True:
+            start = line.find("[", pos)
+            if start < 0:
+                break
+            middle = line.find("](", start + 1)
+            if middle < 0:
+                break
+            end = line.find(")", middle + 2)
+            if end < 0:
+                break
+            yield line[middle + 2:end]
+            pos = end + 1
+
+
+def inline(line):
+    if "[" not in line and "*" not in line:
+        return line
+    return pair(pair(links(line), "**", "strong"), "*", "em")
+
+
+def tokenize(lines):
+    """
+    Yields a (kind, text, item) tuple for every line of the entry.
+
+    kind is "blank", "text", "ul", "ol" or "raw".  For list items, text is
+    whatever comes before the item on the line and item is the item itself.
+    Headings get an extra blank line in front of them, like the original
+    renderer gave them.
+    """
+    for line in lines:
+        if line.startswith("#"):
+            for marker, tag in HEADINGS:
+                if line.startswith(marker):
+                    yield ("blank", "", None)
+                    line = f"<{tag}>{line[len(marker):]}</{tag}>"
+                    break
+
+        if is_blank(line):
+            yield ("blank", line, None)
+            continue
+
+        line = inline(line)
+        bullet = UNORDERED_ITEM.search(line)
+        if bullet:
+            prefix, item = line[:bullet.start()], line[bullet.start() + 2:]
+            if ORDERED_ITEM.match(prefix + "<"):
+                ## An unordered item inside an ordered one ("1. a - b").  The old renderer
+                ## could not pair up the ordered tags across the nested list, so it kept them.
+                number = ORDERED_ITEM.match(prefix + "<").end() - 1
+                yield ("raw", f"<oli>{prefix[number:]}<ul>\n<li>{item}</li></ul>\n</oli>", None)
+            else:
+                yield ("ul", prefix, item)
+        elif ORDERED_ITEM.match(line):
+            yield ("ol", "", line[ORDERED_ITEM.match(line).end() - 1:])
+        else:
+            yield ("text", line, None)
+
+
+def render(content):
+    """
+    Converts Markdown into HTML in one pass over the entry.  Covers H1, H2, H3,
+    a, strong, em, ul, ol, li and p.
+
+    Consecutive list items of the same kind, with only whitespace between them,
+    become one list.  Whitespace after the last item (up to the next piece of
+    text) stays inside the list, as it did with the regex version.
+    """
+    return "".join(render_lines(content.split("\n")))
+
+
+def render_lines(lines):
+    """
+    Yields the HTML of an entry piece by piece, given its lines without their
+    line breaks.  Only the open list's trailing whitespace is held back, so an
+    entry read from a file line by line is rendered without ever being in
+    memory as a whole.  "".join() of the pieces is render() of the entry.
+    """
+    run = None  ## "ul" or "ol" while a list is open
+    trailing = []  ## whitespace seen since the last item of the open list
+    first = True
+
+    for kind, text, item in tokenize(lines):
+        if run:
+            if kind == "blank":
+                trailing.append("\n")
+                trailing.append(text)
+                continue
+            indent = len(text) - len(text.lstrip())
+            if kind == run and indent == len(text):
+                yield "".join(trailing)
+                yield "\n"
+                yield text
+                yield f"<li>{item}</li>"
+                trailing = []
+                continue
+            ## Anything else closes the list and takes this line's indentation with it.
+            yield "".join(trailing)
+            yield "\n"
+            yield text[:indent]
+            yield f"</{run}>\n"
+            text = text[indent:]
+            trailing = []
+            run = None
+        elif not first:
+            yield "\n"
+        first = False
+
+        if kind in ("ul", "ol"):
+            yield paragraph(f"{text}<{kind}>")
+            yield f"\n<li>{item}</li>"
+            run = kind
+        elif kind == "text":
+            yield paragraph(text)
+        else:
+            yield text
+
+    if run:
+        yield "".join(trailing)
+        yield f"</{run}>\n"
+
+
+def read_lines(stream, size=64 * 1024):
+    """
+    Yields the lines of a text stream without their line breaks, reading it
+    size characters at a time.  Only "\n" ends a line, like str.split("\n"),
+    so the lines are exactly those render() would see.
+    """
+    pending = []  ## Pieces of a line that has not ended yet.
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        lines = chunk.split("\n")
+        if len(lines) > 1:
+            pending.append(lines[0])
+            lines[0] = "".join(pending)
+            pending = [lines.pop()]
+            yield from lines
+        else:
+            pending.append(chunk)
+    yield "".join(pending)
+
+
+def may_be_list_item(line):
+    """
+    True unless the line certainly does not become a list item.  Inline markup
+    never creates a "- " or a leading number, so the raw line is enough.
+    """
+    return "- " in line or "* " in line or "+ " in line or ORDERED_ITEM.match(line) is not None
+
+
+def split_blocks(content):
+    """
+    Splits an entry into blocks that render independently: render(content)
+    is "\n".join(render(block) for block in blocks).
+
+    A block starts after a run of blank lines, unless the last line before
+    them might be a list item, because a list stays open across blank lines
+    and takes in the whitespace after it.
+    """
+    blocks = []
+    start = 0
+    for blank in BLANK_LINES.finditer(content):
+        last = content[content.rfind("\n", 0, blank.start()) + 1:blank.start()]
+        if not may_be_list_item(last):
+            blocks.append(content[start:blank.end() - 1])
+            start = blank.end()
+    blocks.append(content[start:])
+    return blocks
+
+
+def render_blocks(content, cache):
+    """
+    Renders an entry block by block, reusing the HTML of any block whose hash
+    is already in cache (anything with get and set).  After a small edit only
+    the edited blocks are rendered again.
+    """
+    parts = []
+    for block in split_blocks(content):
+        key = hashlib.sha1(block.encode("utf-8")).digest()
+        html = cache.get(key)
+        if html is None:
+            html = render(block)
+            cache.set(key, html)
+        parts.append(html)
+    return "\n".join(parts)
+
+
+def render_regex(content):
+    """
+    This converts markdown into html.  Covers H1, H2, H3, a, strong, em, ul, ol, li, p.
+
+    Multiline means it matches the pattern by line instead of whole page.
+    "\1" refers to first instance of the regex, whatever is captured in (.*$), and \2 refers to the seocond captured group.  \g<0> is a whole match.
+
+    Some help from the Duck (cs50.ai) to understand how to fix the paragraph problem (it was overzealous in making paragraphs), but requirements were set by me, including asking it to include the lookahead, but I didn't know about \g<0>.
+
+    This is the original renderer.  It makes about a dozen passes over the whole entry and is kept as the reference that render() has to match.
+    The lazy patterns can backtrack for minutes on adversarial entries, so only call it on trusted text.
+    """
+
+    # Convert heading tags
+    content = re.sub(r'^# (.*)$', r'\n<h1>\1</h1>', content, flags=re.MULTILINE) ## Finds one # and a space at the beginning of the line to make an h1.
+    content = re.sub(r'^## (.*)$', r'\n<h2>\1</h2>', content, flags=re.MULTILINE) ## Finds two # and a space at the beginning of the line to make an h2.
+    content = re.sub(r'^### (.*)$', r'\n<h3>\1</h3>', content, flags=re.MULTILINE) ## Finds three # and a space at the beginning of the line to make an h3.
+
+    # Convert inline content
+    content = re.sub(r'\[(.*?)\]\((.*?)\)', r'<a href="\2">\1</a>', content, flags=re.MULTILINE) ## Finds the []() pattern to build the anchor tag inline.
+    content = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', content, flags=re.MULTILINE)  ## Finds the ** pattern on both sides of text to bold them using a strong tag.
+    content = re.sub(r'\*(.*?)\*', r'<em>\1</em>', content, flags=re.MULTILINE)  ## Finds the * pattern on both sides of text to italicize them using an em tag.
+
+    #Convert lists
+    content = re.sub(r'[*+-] (.+)$', r'<uli>\1</uli>', content, flags=re.MULTILINE)  ## Finds the three options to render a UL list item plus a space and then returns the item in a <uli> tag.  This will be converted to a real tag after wrapping with UL.
+    content = re.sub(r'^\d+\. (.+)$', r'<oli>\1</oli>', content, flags=re.MULTILINE)  ## Finds the three options to render an OL list item plus a space and then returns the item in a <oli> tag.  This will be converted to a real tag after wrapping with OL.
+
+    content = re.sub(r'((<uli>.*?</uli>\s*)+)', r'<ul>\n\1</ul>\n', content, flags=re.MULTILINE)  ## Finds a list of <uli> tags and wraps them in a UL tag.
+    content = re.sub(r'((<oli>.*?</oli>\s*)+)', r'<ol>\n\1</ol>\n', content, flags=re.MULTILINE)  ## Finds a list of <oli> tags and wraps them in an OL tag.
+
+    content = re.sub(r'<[ou]li>(.*?)</[ou]li>', r'<li>\1</li>', content, flags=re.MULTILINE)  ## Finds a list of <uli> or <oli> tags and converts them all to regular LI tags.
+
+    # Convert paragraphs [this will probably break if tables, etc are introduced]
+    content = re.sub(r'^(?!<(/?ul|/?ol|/?li|/?h[1-6]|/?p|/?strong|/?em))[^\s].+$', r'<p>\g<0></p>', content, flags=re.MULTILINE)  ## Finds lines that do not start with items that render anything above (at the beginning of the line) and inserts that content into p tags to make a new paragraph.
+
+    return content
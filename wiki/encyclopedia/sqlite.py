@@ -0,0 +1,28 @@
+"""
+Per-thread SQLite connections for the app's own SQLite files: the search
+index, the link index and SQLiteStore.
+"""
+
+import sqlite3
+import threading
+
+
+class ThreadConnections:
+    """
+    Opens one connection to the database at path for each thread that asks,
+    since sqlite3 connections cannot be shared between threads, and runs the
+    setup script (pragmas and schema) on it first.
+    """
+
+    def __init__(self, path, setup=""):
+        self.path = path
+        self.setup = setup
+        self.local = threading.local()
+
+    def get(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.executescript(self.setup)
+            self.local.connection = connection
+        return connection
@@ -0,0 +1,32 @@
+document.addEventListener('DOMContentLoaded', function() {
+
+  // Fills the search box's datalist with matching titles as the user types.
+  const search = document.querySelector('.search');
+  const list = document.querySelector('#search-suggestions');
+  if (!search || !list) {
+    return;
+  }
+
+  search.addEventListener('input', () => {
+    const q = search.value.trim();
+    if (q === '') {
+      list.innerHTML = '';
+      return;
+    }
+    fetch(`${search.dataset.suggestUrl}?q=${encodeURIComponent(q)}`)
+    .then(response => response.json())
+    .then(data => {
+      // Ignore answers to keystrokes the user has already typed past.
+      if (data.query !== search.value.trim()) {
+        return;
+      }
+      list.innerHTML = '';
+      data.suggestions.forEach(title => {
+        const option = document.createElement('option');
+        option.value = title;
+        list.append(option);
+      });
+    });
+  });
+
+});
@@ -0,0 +1,195 @@
+"""
+Where entries are kept.
+
+util.list_entries, get_entry and save_entry go through the store named by the
+WIKI_ENTRY_STORE setting (a dotted path), built with WIKI_ENTRY_STORE_OPTIONS
+as keyword arguments.  Two stores come with the app:
+
+DirectoryStore keeps one entries/<title>.md file per entry in a Django
+storage, which is how the wiki has always worked.
+
+SQLiteStore keeps every entry in one SQLite file, with the title as primary
+key and reads served through a memory map, so listing, existence checks and
+reads cost no per-file syscalls.  manage.py convert_entries copies entries
+between the two layouts.
+
+Every store offers titles(), stamp() (changes whenever any entry is added or
+removed), version(title) (changes whenever that entry changes, None if it does
+not exist), size(title), read(title), open(title) (a text stream, for reading
+large entries a piece at a time), write(title, content) and
+write_many(entries) (many (title, content) pairs in one go, for imports).
+"""
+
+import io
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.module_loading import import_string
+
+from .sqlite import ThreadConnections
+
+
+class DirectoryStore:
+    def __init__(self, storage=default_storage, directory="entries"):
+        self.storage = storage
+        self.directory = directory
+
+    def filename(self, title):
+        return f"{self.directory}/{title}.md"
+
+    def titles(self):
+        _, filenames = self.storage.listdir(self.directory)
+        return [re.sub(r"\.md$", "", filename) for filename in filenames if filename.endswith(".md")]
+
+    def stamp(self):
+        try:
+            return self.storage.get_modified_time(self.directory)
+        except OSError:
+            return None
+
+    def version(self, title):
+        """
+        Built from the file's modification time and size, so it only looks at
+        the file's metadata, not its content.
+        """
+        filename = self.filename(title)
+        try:
+            modified = self.storage.get_modified_time(filename)
+            return f"{modified.timestamp():.6f}-{self.storage.size(filename)}"
+        except OSError:
+            return None
+
+    def size(self, title):
+        try:
+            return self.storage.size(self.filename(title))
+        except OSError:
+            return None
+
+    def read(self, title):
+        try:
+            with self.storage.open(self.filename(title)) as f:
+                return f.read().decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def open(self, title):
+        try:
+            f = self.storage.open(self.filename(title))
+        except FileNotFoundError:
+            return None
+        return io.TextIOWrapper(f, encoding="utf-8", newline="")  ## newline="" keeps line endings as they are, like read().
+
+    def write(self, title, content):
+        filename = self.filename(title)
+        if self.storage.exists(filename):
+            self.storage.delete(filename)
+        self.storage.save(filename, ContentFile(content))
+
+    def write_many(self, entries):
+        """
+        Writes each entry to a temporary file next to it and renames it into
+        place, so readers see either the old entry or the new one, and an
+        existing entry costs one rename instead of a delete and a save.
+        Storages without local paths fall back to write().
+        """
+        try:
+            directory = self.storage.path(self.directory)
+        except NotImplementedError:
+            for title, content in entries:
+                self.write(title, content)
+            return
+        os.makedirs(directory, exist_ok=True)
+        for title, content in entries:
+            fd, temporary = tempfile.mkstemp(dir=directory, prefix=".import-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(content.encode("utf-8"))
+                os.chmod(temporary, self.storage.file_permissions_mode or 0o644)  ## mkstemp makes files private.
+                os.replace(temporary, self.storage.path(self.filename(title)))
+            except BaseException:
+                os.unlink(temporary)
+                raise
+
+
+class SQLiteStore:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        title TEXT PRIMARY KEY,
+        content TEXT NOT NULL,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS generation (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        value INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO generation (id, value) VALUES (1, 0);
+    """
+
+    def __init__(self, path, mmap_size=256 * 2**20):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.connections = ThreadConnections(path, f"""
+        PRAGMA mmap_size = {int(mmap_size)};
+        PRAGMA journal_mode = WAL;
+        PRAGMA synchronous = NORMAL;  -- Safe with WAL, and avoids an fsync per save.
+        {self.SCHEMA}""")
+
+    @property
+    def connection(self):
+        return self.connections.get()
+
+    def titles(self):
+        return [title for (title,) in self.connection.execute("SELECT title FROM entries ORDER BY title")]
+
+    def stamp(self):
+        ## Bumped by every write, so it also changes when another process writes.
+        return self.connection.execute("SELECT value FROM generation").fetchone()[0]
+
+    def version(self, title):
+        row = self.connection.execute("SELECT version FROM entries WHERE title = ?", (title,)).fetchone()
+        return row[0] if row else None
+
+    def size(self, title):
+        row = self.connection.execute("SELECT length(CAST(content AS BLOB)) FROM entries WHERE title = ?", (title,)).fetchone()
+        return row[0] if row else None
+
+    def read(self, title):
+        row = self.connection.execute("SELECT content FROM entries WHERE title = ?", (title,)).fetchone()
+        return row[0] if row else None
+
+    def open(self, title):
+        ## The content is one TEXT value, and sqlite3's incremental blob reads need a rowid table,
+        ## so the row is read whole.  Rendering from it is still streamed.
+        content = self.read(title)
+        return io.StringIO(content, newline="") if content is not None else None
+
+    def write(self, title, content):
+        with self.connection as connection:
+            connection.execute("UPDATE generation SET value = value + 1")
+            connection.execute(
+                "INSERT INTO entries (title, content, version) VALUES (?, ?, (SELECT value FROM generation)) "
+                "ON CONFLICT (title) DO UPDATE SET content = excluded.content, version = excluded.version",
+                (title, content),
+            )
+
+    def write_many(self, entries):
+        ## One transaction and one generation for the whole batch.
+        with self.connection as connection:
+            connection.execute("UPDATE generation SET value = value + 1")
+            connection.executemany(
+                "INSERT INTO entries (title, content, version) VALUES (?, ?, (SELECT value FROM generation)) "
+                "ON CONFLICT (title) DO UPDATE SET content = excluded.content, version = excluded.version",
+                entries,
+            )
+
+
+def build_entry_store():
+    store = import_string(getattr(settings, "WIKI_ENTRY_STORE", "encyclopedia.stores.DirectoryStore"))
+    return store(**getattr(settings, "WIKI_ENTRY_STORE_OPTIONS", {}))
+
+
+entry_store = build_entry_store()
@@ -1,3 +1,191 @@
-from django.test import TestCase
+import os
+import random
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from . import renderer, util
+from .cache import block_cache, digest_cache, render_cache
+from .fulltext import FullTextIndex
+from .links import LinkGraph
+from .stores import SQLiteStore
+from .titles import title_index
+from .trigrams import trigram_index
+from .management.commands.fuzz_markdown import ATOMS, PATHOLOGICAL, ms_per_kb
+
+
+def corpus():
+    """
+    Returns (name, Markdown) for every entry shipped in entries/.
+    """
+    directory = os.path.join(settings.BASE_DIR, "entries")
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".md"):
+            with open(os.path.join(directory, filename), encoding="utf-8", newline="") as f:
+                yield filename, f.read()
+
+
+def random_entries(count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield f"random {i}", "".join(rng.choice(ATOMS) for _ in range(rng.randint(0, 40)))
+
+
+class RendererTests(SimpleTestCase):
+    def assertRendersLikeRegex(self, entries):
+        for name, content in entries:
+            with self.subTest(entry=name, content=content):
+                html = renderer.render(content)
+                self.assertEqual(html, renderer.render_regex(content))
+                self.assertEqual("\n".join(renderer.render(block) for block in renderer.split_blocks(content)), html)
+                self.assertEqual(util.markdown_to_html(content), html)
+
+    def test_corpus_matches_regex_renderer(self):
+        self.assertRendersLikeRegex(corpus())
+
+    def test_random_entries_match_regex_renderer(self):
+        self.assertRendersLikeRegex(random_entries(2000))
+
+
+class RenderingTimeTests(SimpleTestCase):
+    """
+    The entries that made the regex renderer backtrack, at a size small enough
+    for the test suite.  manage.py fuzz_markdown runs them at full size.
+    """
+
+    size = 32 * 1024
+    max_ms_per_kb = 5.0
+
+    def test_pathological_entries_render_in_linear_time(self):
+        def render_blocks(content):
+            block_cache.clear()  ## Every run renders every block, as the first view of an entry would.
+            return util.markdown_to_html(content)
+
+        for name, build in PATHOLOGICAL.items():
+            content = build(self.size)
+            for render in (renderer.render, render_blocks):
+                with self.subTest(entry=name, render=render.__name__):
+                    self.assertLess(ms_per_kb(render, content), self.max_ms_per_kb)
+
+
+class TemporaryWikiTestCase(SimpleTestCase):
+    """
+    Points the entry store and the link and search indexes at fresh SQLite
+    files for each test, so tests can save entries without touching entries/.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SQLiteStore(os.path.join(directory.name, "entries.sqlite3"))
+        for target, name, value in (
+            (util, "entry_store", self.store),
+            (title_index, "store", self.store),
+            (util, "link_graph", LinkGraph(os.path.join(directory.name, "links.sqlite3"))),
+            (util, "search_index", FullTextIndex(os.path.join(directory.name, "search.sqlite3"))),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for cache in (title_index, render_cache, digest_cache):
+            cache.clear()
+            self.addCleanup(cache.clear)
+
+
+class CacheInvalidationTests(TemporaryWikiTestCase):
+    def test_save_drops_cached_html_and_digest(self):
+        util.save_entry("Alpha", "# One")
+        self.assertHTMLEqual(util.get_entry_html("Alpha"), "<h1>One</h1>")
+        self.assertHTMLEqual(util.get_entry_html("Alpha"), "<h1>One</h1>")
+        self.assertEqual(render_cache.stats()["misses"], 1)
+        self.assertEqual(render_cache.stats()["hits"], 1)
+        digest = util.entry_digest("Alpha")
+        self.assertEqual(util.entry_digest("Alpha"), digest)
+
+        util.save_entry("Alpha", "# Two")
+        self.assertHTMLEqual(util.get_entry_html("Alpha"), "<h1>Two</h1>")
+        self.assertNotEqual(util.entry_digest("Alpha"), digest)
+        self.assertEqual(render_cache.stats()["misses"], 2)
+        self.assertEqual(render_cache.stats()["hits"], 1)
+        self.assertEqual(digest_cache.stats()["misses"], 2)
+        self.assertEqual(digest_cache.stats()["hits"], 1)
+
+    def test_outside_edit_misses(self):
+        util.save_entry("Alpha", "# One")
+        util.get_entry_html("Alpha")
+        digest = util.entry_digest("Alpha")
+        self.store.write("Alpha", "# Edited")  ## Straight to the store, as another process would.
+        self.assertHTMLEqual(util.get_entry_html("Alpha"), "<h1>Edited</h1>")
+        self.assertNotEqual(util.entry_digest("Alpha"), digest)
+        self.assertEqual(render_cache.stats()["misses"], 2)
+        self.assertEqual(render_cache.stats()["hits"], 0)
+
+    def test_save_adds_title_without_reloading(self):
+        util.save_entry("Alpha", "# One")
+        self.assertEqual(util.similar_titles("Alpah"), ["Alpha"])
+        loads = title_index.loads
+        util.save_entry("Zebra", "# Stripes")
+        self.assertTrue(util.entry_exists("Zebra"))
+        self.assertEqual(util.list_entries(), ["Alpha", "Zebra"])
+        self.assertEqual(util.similar_titles("Zebar"), ["Zebra"])
+        self.assertEqual(title_index.loads, loads)
+        self.assertEqual(trigram_index.loads, loads)
+
+
+class ConditionalRequestTests(TemporaryWikiTestCase):
+    def assertRevalidates(self, url):
+        """
+        Checks that url answers 304 to its own ETag, and returns the ETag.
+        """
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        return etag
+
+    def assertChanged(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_entry(self):
+        util.save_entry("Alpha", "# One")
+        etag = self.assertRevalidates("/wiki/Alpha")
+        util.save_entry("Alpha", "# Two")
+        self.assertChanged("/wiki/Alpha", etag)
+
+        etag = self.assertRevalidates("/wiki/Alpha")
+        util.save_entry("Beta", "See [Alpha](/wiki/Alpha).")  ## A new backlink changes the page too.
+        self.assertChanged("/wiki/Alpha", etag)
+
+    def test_index(self):
+        util.save_entry("Alpha", "# One")
+        etag = self.assertRevalidates("/")
+        util.save_entry("Beta", "# Two")
+        self.assertChanged("/", etag)
+
+
+class TitleCaseTests(TemporaryWikiTestCase):
+    def setUp(self):
+        super().setUp()
+        util.save_entry("CSS", "# Stylesheets")
+        util.save_entry("Python", "# Snakes")
+
+    def test_entry_in_other_casing_redirects(self):
+        self.assertRedirects(self.client.get("/wiki/css"), "/wiki/CSS", fetch_redirect_response=False)
+
+    def test_unknown_entry(self):
+        self.assertEqual(self.client.get("/wiki/Nothing").status_code, 404)
+
+    def test_search_for_a_title_in_any_casing_redirects(self):
+        util.save_entry("CSS Grid", "# Layout")  ## Also contains "css", but the title match still wins.
+        self.assertRedirects(self.client.get("/search", {"q": "css"}), "/wiki/CSS", fetch_redirect_response=False)
+
+    def test_exact_match_wins(self):
+        util.save_entry("Css", "# Other")
+        self.assertContains(self.client.get("/wiki/Css"), "Other")
+        self.assertRedirects(self.client.get("/wiki/cSS"), "/wiki/CSS", fetch_redirect_response=False)
+        self.assertRedirects(self.client.get("/search", {"q": "Css"}), "/wiki/Css", fetch_redirect_response=False)
+        self.assertRedirects(self.client.get("/search", {"q": "CSS"}), "/wiki/CSS", fetch_redirect_response=False)
@@ -0,0 +1,164 @@
+"""
+Process-wide sorted index of entry titles.
+
+The entry store is listed once and then kept up to date by save_entry.  At
+most once per CHECK_INTERVAL seconds a lookup asks the store for its stamp
+(for the directory store, the directory's modification time), and if it has
+moved (an entry was added or removed outside the app) the listing is read
+again.  Lookups are bisections on the sorted list, so
+existence checks and prefix searches are O(log n).  A dict from casefolded
+title to title resolves any casing of a title in O(1).
+"""
+
+import hashlib
+import random
+import threading
+import time
+from bisect import bisect_left, insort
+
+from .stores import entry_store
+
+CHECK_INTERVAL = 1.0
+
+
+def contains(titles, title):
+    i = bisect_left(titles, title)
+    return i < len(titles) and titles[i] == title
+
+
+def canonical_titles(folded):
+    canonical = {}
+    for key, title in folded:
+        canonical.setdefault(key, title)
+    return canonical
+
+
+class TitleIndex:
+    def __init__(self, store):
+        self.store = store
+        self.sorted = None  ## Replaced, never changed in place, so readers can keep a reference.
+        self.folded = None  ## (casefolded title, title) pairs in order, for case-insensitive prefixes.
+        self.canonical = None  ## Casefolded title -> title.  If two titles differ only in case, the first in order.
+        self.stamp = None
+        self.loads = 0  ## Counts reloads from the store, so indexes built on the titles know when to rebuild.
+        self.checked = 0.0
+        self.hashed = (None, None)  ## (title list, its digest)
+        self.lock = threading.Lock()
+
+    def titles(self):
+        """
+        Returns the sorted list of titles.  The list is shared, so callers must
+        not change it.
+        """
+        now = time.monotonic()
+        if self.sorted is None or now - self.checked >= CHECK_INTERVAL:
+            stamp = self.store.stamp()
+            if self.sorted is None or stamp != self.stamp:
+                self.reload(stamp)
+            self.checked = now
+        return self.sorted
+
+    def reload(self, stamp):
+        titles = sorted(self.store.titles())
+        folded = sorted((title.casefold(), title) for title in titles)
+        with self.lock:
+            self.sorted, self.folded, self.canonical = titles, folded, canonical_titles(folded)
+            self.stamp = stamp
+            self.loads += 1
+
+    def exists(self, title):
+        return contains(self.titles(), title)
+
+    def resolve(self, title):
+        """
+        Returns the title that title names, ignoring case, or None.  An exact
+        match wins over one that differs in case.
+        """
+        if self.exists(title):
+            return title
+        return self.canonical.get(title.casefold())
+
+    def containing(self, text):
+        """
+        Returns the titles that contain text, ignoring case, in order.
+        """
+        self.titles()
+        text = text.casefold()
+        return [title for folded, title in self.folded if text in folded]
+
+    def prefixed(self, prefix, limit=None):
+        """
+        Returns the titles that start with prefix, ignoring case, in order, up
+        to limit.
+        """
+        self.titles()
+        folded = self.folded
+        prefix = prefix.casefold()
+        results = []
+        for i in range(bisect_left(folded, (prefix,)), len(folded)):
+            if not folded[i][0].startswith(prefix) or len(results) == limit:
+                break
+            results.append(folded[i][1])
+        return results
+
+    def digest(self):
+        """
+        Returns a SHA-256 of the titles, worked out once per version of the list.
+        """
+        titles = self.titles()
+        hashed, digest = self.hashed
+        if hashed is not titles:
+            digest = hashlib.sha256("\0".join(titles).encode("utf-8")).hexdigest()
+            self.hashed = (titles, digest)
+        return digest
+
+    def random(self, exclude=None):
+        """
+        Returns a random title other than exclude, in one draw, or None if
+        there are no titles.  If exclude is the only title it is returned.
+        """
+        titles = self.titles()
+        if len(titles) < 2:
+            return titles[0] if titles else None
+        if exclude is not None and contains(titles, exclude):
+            ## Draw from every position but exclude's, by skipping over it.
+            i = random.randrange(len(titles) - 1)
+            return titles[i + 1] if i >= bisect_left(titles, exclude) else titles[i]
+        return titles[random.randrange(len(titles))]
+
+    def add(self, title):
+        """
+        Records a title that was just saved, without listing the store again.
+        """
+        self.titles()
+        with self.lock:
+            if not contains(self.sorted, title):
+                titles = list(self.sorted)
+                insort(titles, title)
+                folded = list(self.folded)
+                insort(folded, (title.casefold(), title))
+                canonical = dict(self.canonical)
+                canonical[title.casefold()] = min(canonical.get(title.casefold(), title), title)
+                self.sorted, self.folded, self.canonical = titles, folded, canonical
+            self.stamp = self.store.stamp()
+
+    def add_many(self, titles):
+        """
+        Records many titles that were just saved, merging them in with one sort.
+        """
+        self.titles()
+        with self.lock:
+            added = set(titles).difference(self.sorted)
+            if added:
+                self.sorted = sorted(self.sorted + list(added))
+                self.folded = sorted(self.folded + [(title.casefold(), title) for title in added])
+                self.canonical = canonical_titles(self.folded)
+            self.stamp = self.store.stamp()
+
+    def clear(self):
+        with self.lock:
+            self.sorted = self.folded = self.canonical = None
+            self.stamp = None
+
+
+title_index = TitleIndex(entry_store)
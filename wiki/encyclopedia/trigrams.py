@@ -0,0 +1,89 @@
+"""
+Trigram index over entry titles, used for "did you mean" suggestions.
+
+Every title is broken into the three-letter pieces of its casefolded,
+space-padded form, and each piece points at the titles that contain it.  A
+lookup only visits the titles that share at least one piece with the query,
+then ranks them by how many pieces they share (the Jaccard similarity of the
+two sets), so it does not compare the query against every title.
+"""
+
+import threading
+from collections import Counter, defaultdict
+
+from .titles import title_index
+
+THRESHOLD = 0.25  ## Low enough to catch a swapped pair of letters in a short title.
+
+
+def trigrams(text):
+    text = f"  {text.casefold()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self, titles):
+        self.titles = titles
+        self.loads = None  ## The title index reload the index was built from.
+        self.postings = defaultdict(set)
+        self.sizes = {}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Rebuilds the index if the title index has reloaded its titles from the
+        store since.  Titles saved through the app are added one at a time.
+        """
+        titles = self.titles.titles()
+        loads = self.titles.loads
+        if loads != self.loads:
+            postings = defaultdict(set)
+            sizes = {}
+            for title in titles:
+                grams = trigrams(title)
+                sizes[title] = len(grams)
+                for gram in grams:
+                    postings[gram].add(title)
+            with self.lock:
+                self.postings, self.sizes, self.loads = postings, sizes, loads
+
+    def add(self, title):
+        """
+        Adds a title that was just saved.
+        """
+        self.add_many([title])
+
+    def add_many(self, titles):
+        """
+        Adds titles that were just saved, without rebuilding the index.
+        """
+        self.refresh()
+        with self.lock:
+            for title in titles:
+                if title not in self.sizes:
+                    grams = trigrams(title)
+                    self.sizes[title] = len(grams)
+                    for gram in grams:
+                        self.postings[gram].add(title)
+
+    def similar(self, query, limit=5, threshold=THRESHOLD):
+        """
+        Returns up to limit titles that look like query, most similar first.
+        """
+        self.refresh()
+        grams = trigrams(query)
+        shared = Counter()
+        with self.lock:
+            for gram in grams:
+                shared.update(self.postings.get(gram, ()))
+            sizes = self.sizes
+        scored = []
+        for title, count in shared.items():
+            score = count / (len(grams) + sizes[title] - count)
+            if score >= threshold:
+                scored.append((-score, title))
+        scored.sort()
+        return [title for _, title in scored[:limit]]
+
+
+trigram_index = TrigramIndex(title_index)
@@ -9,6 +9,8 @@ urlpatterns = [
     path("wiki/<str:title>/edit", views.edit, name="edit"),
     path('wiki/<str:title>/save/', views.save, name='save'),
     path("search", views.search, name="search"),
-    path("random", views.randomPage, name="random")
+    path("search/suggest", views.suggest, name="suggest"),
+    path("random", views.randomPage, name="random"),
+    path("orphans", views.orphans, name="orphans")
 ]
 
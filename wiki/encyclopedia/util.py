@@ -1,16 +1,42 @@
-import re
+import hashlib
 
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
+from . import renderer
+from .cache import block_cache, digest_cache, render_cache
+from .fulltext import search_index
+from .links import link_graph
+from .stores import entry_store
+from .titles import title_index
+from .trigrams import trigram_index
+
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 def list_entries():
     """
     Returns a list of all names of encyclopedia entries.
     """
-    _, filenames = default_storage.listdir("entries")
-    return list(sorted(re.sub(r"\.md$", "", filename)
-                for filename in filenames if filename.endswith(".md")))
+    return list(title_index.titles())
+
+
+def entry_exists(title):
+    """
+    Checks whether an entry exists without listing the entry store.
+    """
+    return title_index.exists(title)
+
+
+def resolve_title(title):
+    """
+    Returns the title of the entry title names in any casing, or None.
+    """
+    return title_index.resolve(title)
+
+
+def titles_containing(text):
+    """
+    Returns the titles that contain text, ignoring case, in order.
+    """
+    return title_index.containing(text)
 
 
 def save_entry(title, content):
@@ -19,10 +45,33 @@ def save_entry(title, content):
     content. If an existing entry with the same title already exists,
     it is replaced.
     """
-    filename = f"entries/{title}.md"
-    if default_storage.exists(filename):
-        default_storage.delete(filename)
-    default_storage.save(filename, ContentFile(content))
+    version = entry_version(title)
+    entry_store.write(title, content)
+    render_cache.invalidate(title, version)
+    digest_cache.invalidate(title, version)
+    title_index.add(title)
+    trigram_index.add(title)
+    search_index.add(title, content)
+    link_graph.update(title, content)
+
+
+def save_entries(entries):
+    """
+    Saves many entries at once, given (title, content) pairs with no title
+    repeated.  The store writes them as one batch, and the title, trigram,
+    search and link indexes are each updated once for the whole batch rather
+    than once per entry.
+    """
+    entries = list(entries)
+    versions = [(title, entry_version(title)) for title, _ in entries]
+    entry_store.write_many(entries)
+    for title, version in versions:
+        render_cache.invalidate(title, version)
+        digest_cache.invalidate(title, version)
+    title_index.add_many(title for title, _ in entries)
+    trigram_index.add_many(title for title, _ in entries)
+    search_index.add_many(entries)
+    link_graph.update_many(entries)
 
 
 def get_entry(title):
@@ -30,44 +79,155 @@ def get_entry(title):
     Retrieves an encyclopedia entry by its title. If no such
     entry exists, the function returns None.
     """
-    try:
-        f = default_storage.open(f"entries/{title}.md")
-        return f.read().decode("utf-8")
-    except FileNotFoundError:
+    return entry_store.read(title)
+
+
+def entry_version(title):
+    """
+    Returns a stamp that changes whenever an entry changes, or None if the
+    entry does not exist.  This does not read the entry's content.
+    """
+    return entry_store.version(title)
+
+
+def entry_size(title):
+    """
+    Returns the size of an entry's Markdown in bytes, or None if it does not
+    exist.
+    """
+    return entry_store.size(title)
+
+
+def get_entry_html(title):
+    """
+    Returns an entry rendered as HTML, or None if it does not exist.  The
+    rendered HTML is cached per version, so the Markdown is only read and
+    rendered again after the entry changes.
+    """
+    version = entry_version(title)
+    if version is None:
         return None
+    html = render_cache.get(title, version)
+    if html is None:
+        content = get_entry(title)
+        if content is None:
+            return None
+        html = markdown_to_html(content)
+        render_cache.set(title, version, html)
+    return html
 
 
+def stream_entry_html(title):
+    """
+    Returns an iterator over an entry's HTML, or None if it does not exist.
+    The Markdown is read and rendered a chunk at a time, so a very large entry
+    is never held in memory as a whole, neither as Markdown nor as HTML.
+    Nothing is cached.
+    """
+    stream = entry_store.open(title)
+    if stream is None:
+        return None
+
+    def pieces():
+        with stream:
+            yield from renderer.render_lines(renderer.read_lines(stream, STREAM_CHUNK_SIZE))
+    return pieces()
+
+
+def entry_digest(title):
+    """
+    Returns the SHA-256 of an entry's Markdown, or None if it does not exist.
+    The digest is cached per version, so the entry is only read once after it
+    changes, and it is read a chunk at a time.
+    """
+    version = entry_version(title)
+    if version is None:
+        return None
+    digest = digest_cache.get(title, version)
+    if digest is None:
+        stream = entry_store.open(title)
+        if stream is None:
+            return None
+        digest = hashlib.sha256()
+        with stream:
+            for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), ""):
+                digest.update(chunk.encode("utf-8"))
+        digest = digest.hexdigest()
+        digest_cache.set(title, version, digest)
+    return digest
+
+
+def titles_digest():
+    """
+    Returns a SHA-256 of the list of titles, which only changes when an entry
+    is added or removed.
+    """
+    return title_index.digest()
+
+
+def ensure_link_graph():
+    if link_graph.is_empty():
+        link_graph.rebuild((title, get_entry(title)) for title in list_entries())
+
+
+def backlinks(title):
+    """
+    Returns the titles of the entries that link to title.
+    """
+    ensure_link_graph()
+    return [source for source in link_graph.backlinks(title) if title_index.exists(source)]
+
+
+def orphaned_entries():
+    """
+    Returns the titles of the entries no other entry links to.
+    """
+    ensure_link_graph()
+    linked = link_graph.linked(title_index.exists)
+    return [title for title in title_index.titles() if title not in linked]
+
+
+def random_entry(exclude=None):
+    """
+    Returns a random entry title other than exclude, or None if there are no
+    entries.
+    """
+    return title_index.random(exclude)
+
+
+def complete_title(prefix, limit=10):
+    """
+    Returns up to limit titles starting with prefix, ignoring case, in order.
+    """
+    return title_index.prefixed(prefix, limit)
+
+
+def similar_titles(query, limit=5):
+    """
+    Returns up to limit titles that are spelled like query, for "did you
+    mean" suggestions when a search finds nothing.
+    """
+    return trigram_index.similar(query, limit)
+
+
+def search_entries(query):
+    """
+    Returns the entries whose content matches query, best match first, as a
+    lazily sliced sequence of (title, score) that can be paginated.  The index
+    is built from the entry store the first time it is needed.
+    """
+    if search_index.is_empty():
+        search_index.rebuild((title, get_entry(title)) for title in list_entries())
+    return search_index.search(query)
+
 
 def markdown_to_html(content):
     """
-    This converts markdown into html.  Covers H1, H2, H3, a, strong, em, ul, ol, li, p.
-
-    Multiline means it matches the pattern by line instead of whole page.  
-    "\1" refers to first instance of the regex, whatever is captured in (.*$), and \2 refers to the seocond captured group.  \g<0> is a whole match.
-
-    Some help from the Duck (cs50.ai) to understand how to fix the paragraph problem (it was overzealous in making paragraphs), but requirements were set by me, including asking it to include the lookahead, but I didn't know about \g<0>.
-    """
-
-    # Convert heading tags
-    content = re.sub(r'^# (.*)$', r'\n<h1>\1</h1>', content, flags=re.MULTILINE) ## Finds one # and a space at the beginning of the line to make an h1.  
-    content = re.sub(r'^## (.*)$', r'\n<h2>\1</h2>', content, flags=re.MULTILINE) ## Finds two # and a space at the beginning of the line to make an h2.
-    content = re.sub(r'^### (.*)$', r'\n<h3>\1</h3>', content, flags=re.MULTILINE) ## Finds three # and a space at the beginning of the line to make an h3.
-    
-    # Convert inline content
-    content = re.sub(r'\[(.*?)\]\((.*?)\)', r'<a href="\2">\1</a>', content, flags=re.MULTILINE) ## Finds the []() pattern to build the anchor tag inline.
-    content = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', content, flags=re.MULTILINE)  ## Finds the ** pattern on both sides of text to bold them using a strong tag.
-    content = re.sub(r'\*(.*?)\*', r'<em>\1</em>', content, flags=re.MULTILINE)  ## Finds the * pattern on both sides of text to italicize them using an em tag.
-
-    #Convert lists
-    content = re.sub(r'[*+-] (.+)$', r'<uli>\1</uli>', content, flags=re.MULTILINE)  ## Finds the three options to render a UL list item plus a space and then returns the item in a <uli> tag.  This will be converted to a real tag after wrapping with UL.
-    content = re.sub(r'^\d+\. (.+)$', r'<oli>\1</oli>', content, flags=re.MULTILINE)  ## Finds the three options to render an OL list item plus a space and then returns the item in a <oli> tag.  This will be converted to a real tag after wrapping with OL.
-    
-    content = re.sub(r'((<uli>.*?</uli>\s*)+)', r'<ul>\n\1</ul>\n', content, flags=re.MULTILINE)  ## Finds a list of <uli> tags and wraps them in a UL tag.
-    content = re.sub(r'((<oli>.*?</oli>\s*)+)', r'<ol>\n\1</ol>\n', content, flags=re.MULTILINE)  ## Finds a list of <oli> tags and wraps them in an OL tag.
-
-    content = re.sub(r'<[ou]li>(.*?)</[ou]li>', r'<li>\1</li>', content, flags=re.MULTILINE)  ## Finds a list of <uli> or <oli> tags and converts them all to regular LI tags.
- 
-    # Convert paragraphs [this will probably break if tables, etc are introduced]
-    content = re.sub(r'^(?!<(/?ul|/?ol|/?li|/?h[1-6]|/?p|/?strong|/?em))[^\s].+$', r'<p>\g<0></p>', content, flags=re.MULTILINE)  ## Finds lines that do not start with items that render anything above (at the beginning of the line) and inserts that content into p tags to make a new paragraph.
-    
-    return content
\ No newline at end of file
+    Converts an entry's Markdown into HTML.  Covers H1, H2, H3, a, strong, em,
+    ul, ol, li, p.  See renderer.render for how it is done in one pass and
+    in linear time, so a pasted entry cannot tie up a worker.
+
+    The entry is rendered block by block through the block cache, so after an
+    edit only the changed blocks are rendered again.
+    """
+    return renderer.render_blocks(content, block_cache)
@@ -1,10 +1,18 @@
 from django.shortcuts import render
 from django import forms
-from django.http import HttpResponseRedirect, Http404
+from django.conf import settings
+from django.http import HttpResponseRedirect, Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
 from django.urls import reverse
-import random
+from django.core.paginator import Paginator
+from functools import lru_cache
+import hashlib
+import secrets
 
-from . import util
+from . import fulltext, util
 
 class NewEntryForm(forms.Form):
     entryTitle = forms.CharField(label="Entry Title")
@@ -15,23 +23,90 @@ class EditForm(forms.Form):
     entryTitle = forms.CharField(label="Entry Title")
     entryContent = forms.CharField(widget=forms.Textarea, label="Entry Content")
 
+# ETags cover the templates as well as the entries, so a change to the layout is not hidden behind a 304.
+@lru_cache(maxsize=None)
+def templates_digest():
+    return hashlib.sha256("".join(
+        get_template(name).template.source for name in ("encyclopedia/layout.html", "encyclopedia/entry.html", "encyclopedia/index.html")
+    ).encode("utf-8")).hexdigest()
+
+def page_etag(*parts):
+    if None in parts:
+        return None
+    return hashlib.sha256("\0".join((templates_digest(),) + parts).encode("utf-8")).hexdigest()
+
+@condition(etag_func=lambda request: page_etag("index", util.titles_digest()))
 def index(request):
     return render(request, "encyclopedia/index.html", {
         "entries": util.list_entries()
     })
 
+# The ETag comes from the entry's content digest, which is cached per version, so a 304 needs neither a read nor a render.
+# The backlinks are part of the page too, so they are part of the ETag.
+def entry_etag(request, title):
+    if not util.entry_exists(title):
+        return None
+    return page_etag("entry", title, util.entry_digest(title), *util.backlinks(title))
+
+@condition(etag_func=entry_etag)
 def entry(request, title):
-    entry = util.get_entry(title)
-    if entry is None:
+    # Any other casing of a title redirects to the entry, found in the title index without touching the store.
+    if not util.entry_exists(title):
+        canonical = util.resolve_title(title)
+        if canonical is None:
+            raise Http404()
+        return HttpResponseRedirect(reverse("entry", args=[canonical]))
+
+    # Very large entries are rendered while they are sent instead of being read, rendered and cached whole.
+    size = util.entry_size(title)
+    if size is not None and size >= getattr(settings, "WIKI_STREAM_THRESHOLD", 2**20):
+        return stream_page(request, "encyclopedia/entry.html", {
+            "title": title,
+            "backlinks": util.backlinks(title)
+        }, "content", util.stream_entry_html(title))
+
+    content = util.get_entry_html(title) # Rendered html for the page, cached until the entry changes.
+    if content is None:
         raise Http404()
     else:
-        content = util.markdown_to_html(entry) # Convert content to html to render in page.
         return render(request, "encyclopedia/entry.html/", {
-            "entry": entry,
             "content": content,
-            "title": title
+            "title": title,
+            "backlinks": util.backlinks(title)
         })
 
+def stream_page(request, template, context, name, pieces, chunk_size=64 * 1024):
+    """
+    Streams a template with the iterator pieces in place of the variable name.
+    The template is rendered once around a marker and sent in two halves, and
+    the pieces in between are sent in chunks of about chunk_size characters.
+    """
+    if pieces is None:
+        raise Http404()
+    marker = f"<!--{secrets.token_hex(16)}-->"
+    head, tail = render_to_string(template, {**context, name: mark_safe(marker)}, request).split(marker, 1)
+
+    def chunks():
+        yield head
+        buffer = []
+        buffered = 0
+        for piece in pieces:
+            buffer.append(piece)
+            buffered += len(piece)
+            if buffered >= chunk_size:
+                yield "".join(buffer)
+                buffer = []
+                buffered = 0
+        buffer.append(tail)
+        yield "".join(buffer)
+    return StreamingHttpResponse(chunks())
+
+# Lists the pages nothing links to, straight from the link index.
+def orphans(request):
+    return render(request, "encyclopedia/orphans.html", {
+        "entries": util.orphaned_entries()
+    })
+
 def edit(request, title):
     content = util.get_entry(title)
     return render(request, "encyclopedia/edit.html/", {
@@ -41,7 +116,6 @@ def edit(request, title):
     })
 
 def save(request, title):
-    entries = util.list_entries()
     if request.method == "POST":
         form = EditForm(request.POST)
         if form.is_valid(): 
@@ -58,13 +132,12 @@ def save(request, title):
     })
 
 def add(request):
-    entries = util.list_entries()
     if request.method == "POST":
         form = NewEntryForm(request.POST)
         if form.is_valid(): 
             entryTitle = form.cleaned_data["entryTitle"]
             entryContent = form.cleaned_data["entryContent"]
-            if entryTitle in entries:  ## Checks to see if title already exists and if so, renders an error in the page.
+            if util.entry_exists(entryTitle):  ## Checks to see if title already exists and if so, renders an error in the page.
                 return render(request, "encyclopedia/add.html", {
                 "form": form,
                 "error": "An entry with this title already exists.  Please change the title to continue."
@@ -82,37 +155,47 @@ def add(request):
 
 def search(request):
     notfound = None
-    q = request.GET.get('q').lower()
-    entries = util.list_entries()
-
-    results = []
-    for entry in entries:
-        if q in entry.lower():
-            results.append(entry)
-    if not results:
+    query = request.GET.get('q', '')
+    exact = util.resolve_title(query)
+    if exact is not None:
+        return HttpResponseRedirect(reverse("entry", args=[exact]))
+
+    results = util.titles_containing(query)
+
+    ## Full-text matches on the content, ranked and paginated, with the matching words highlighted.
+    page = Paginator(util.search_entries(query), 10).get_page(request.GET.get('page'))
+    matches = [(title, fulltext.snippet(util.get_entry(title) or "", query)) for title, score in page]
+    suggestions = [] if results else util.similar_titles(query)  ## Catches misspelled titles.
+    if not results and not matches and not suggestions:
         notfound = "No results.  Please try a new search."
 
-    if len(results) == 1 and q == results[0].lower(): 
-        return HttpResponseRedirect(reverse("entry", args=[results[0]]))
-    else:
-        return render(request, "encyclopedia/search.html",{
-            "results": results,
-            "error": notfound
-        })
+    return render(request, "encyclopedia/search.html",{
+        "query": query,
+        "results": results,
+        "matches": matches,
+        "suggestions": suggestions,
+        "page": page,
+        "error": notfound
+    })
+
+# Type-ahead for the sidebar search box.  Answers from the in-memory title index, so a keystroke never touches the entries directory.
+@cache_control(public=True, max_age=60)
+def suggest(request):
+    q = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), 20))
+    except ValueError:
+        limit = 10
+    return JsonResponse({
+        "query": q,
+        "suggestions": util.complete_title(q, limit) if q else []
+    })
 
 def randomPage(request):
-    entries = util.list_entries()
-    if len(entries) == 0:  ## ensures if there are no pages yet that the index will show.
+    # This makes sure it will return a new page by getting the current title and leaving it out of the draw.
+    entry = util.random_entry(exclude=request.GET.get('title'))
+    if entry is None:  ## ensures if there are no pages yet that the index will show.
         return render(request, "encyclopedia/index.html",{
-            "entries": util.list_entries()
+            "entries": []
         })
-    elif len(entries) == 1: ## ensures that if there is only one page, it can't be random and will be selected.
-        return HttpResponseRedirect(reverse("entry", args=[entries[0]]))
-    else:
-        # This makes sure it will return a new page by getting the current title and ensuring the page will change.
-        current_title = request.GET.get('title')
-        while True:
-            entry = random.choice(entries)
-            if entry != current_title:
-                break
-        return HttpResponseRedirect(reverse("entry", args=[entry]))
\ No newline at end of file
+    return HttpResponseRedirect(reverse("entry", args=[entry]))
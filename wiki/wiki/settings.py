@@ -119,3 +119,40 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Rendered entry cache (see encyclopedia/cache.py)
+# WIKI_RENDER_CACHE_BACKEND can name one of CACHES to share rendered pages between processes.
+
+WIKI_RENDER_CACHE_SIZE = 256
+
+WIKI_RENDER_CACHE_BACKEND = None
+
+# Total characters of block HTML kept for re-rendering edited entries.
+
+WIKI_BLOCK_CACHE_SIZE = 32 * 2**20
+
+
+# Full-text search index (see encyclopedia/fulltext.py), rebuilt with manage.py rebuild_search_index
+
+WIKI_SEARCH_INDEX = os.path.join(BASE_DIR, 'search.sqlite3')
+
+
+# Where entries are kept (see encyclopedia/stores.py).  To keep them all in one SQLite file instead of entries/, use
+# WIKI_ENTRY_STORE = 'encyclopedia.stores.SQLiteStore'
+# WIKI_ENTRY_STORE_OPTIONS = {'path': os.path.join(BASE_DIR, 'entries.sqlite3')}
+# and copy the existing entries over with manage.py convert_entries to-sqlite.
+
+WIKI_ENTRY_STORE = 'encyclopedia.stores.DirectoryStore'
+
+WIKI_ENTRY_STORE_OPTIONS = {}
+
+
+# Index of links between entries (see encyclopedia/links.py), rebuilt with manage.py rebuild_search_index
+
+WIKI_LINK_INDEX = os.path.join(BASE_DIR, 'links.sqlite3')
+
+
+# Entries of at least this many bytes are rendered while they are sent instead of being rendered whole and cached.
+
+WIKI_STREAM_THRESHOLD = 2**20